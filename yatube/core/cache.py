@@ -0,0 +1,215 @@
+"""Двухуровневый кэш.
+
+L1 — небольшой LRU-кэш в памяти процесса, L2 — общий для всех
+процессов кэш (любой бэкенд из settings.CACHES, например файловый или
+Redis). Записи L1 живут не дольше L1_TIMEOUT секунд, поэтому изменения,
+сделанные другим процессом, становятся видны с такой задержкой; ключи
+пространств имён с 'L1': False читаются только из L2.
+
+Пример настройки::
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.cache.TieredCache',
+            'OPTIONS': {
+                'L2': 'shared',
+                'L1_MAX_ENTRIES': 1000,
+                'L1_TIMEOUT': 5,
+                'NAMESPACES': {
+                    'feed_version': {'TIMEOUT': None, 'L1': False},
+                },
+            },
+        },
+        'shared': {...},
+    }
+
+Пространство имён ключа — самый длинный префикс из NAMESPACES, с
+которого ключ начинается. TIMEOUT пространства применяется, когда
+вызывающий код не передал срок жизни явно.
+"""
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from . import metrics
+
+MISSING = object()
+
+
+class TieredCache(BaseCache):
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._l2_alias = options['L2']
+        self._l1_max_entries = options.get('L1_MAX_ENTRIES', 1000)
+        self._l1_timeout = options.get('L1_TIMEOUT', 5)
+        self._namespaces = sorted(
+            options.get('NAMESPACES', {}).items(),
+            key=lambda item: len(item[0]),
+            reverse=True,
+        )
+        self._l1 = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = Counter()
+
+    @property
+    def l2(self):
+        return caches[self._l2_alias]
+
+    def namespace(self, key):
+        for prefix, options in self._namespaces:
+            if key.startswith(prefix):
+                return prefix, options
+        return None, {}
+
+    def stats(self):
+        """Попадания и промахи по уровням и пространствам имён."""
+        with self._lock:
+            return dict(self._stats)
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats.clear()
+
+    def _count(self, key, event):
+        prefix = self.namespace(key)[0] or 'other'
+        tier, result = event.split('_')
+        metrics.incr(f'cache_{result}', tier=tier, namespace=prefix)
+        with self._lock:
+            self._stats[event] += 1
+            self._stats[f'{prefix}.{event}'] += 1
+
+    def _timeout(self, key, timeout):
+        if timeout is DEFAULT_TIMEOUT:
+            options = self.namespace(key)[1]
+            if 'TIMEOUT' in options:
+                return options['TIMEOUT']
+        return timeout
+
+    def _l1_enabled(self, key):
+        return self._l1_timeout > 0 and self.namespace(key)[1].get(
+            'L1', True)
+
+    def _l1_get(self, cache_key):
+        with self._lock:
+            entry = self._l1.get(cache_key)
+            if entry is None:
+                return MISSING
+            value, expires = entry
+            if expires <= time.monotonic():
+                del self._l1[cache_key]
+                return MISSING
+            self._l1.move_to_end(cache_key)
+            return value
+
+    def _l1_set(self, key, cache_key, value, timeout):
+        if not self._l1_enabled(key):
+            return
+        ttl = self._l1_timeout
+        if timeout is not DEFAULT_TIMEOUT and timeout is not None:
+            ttl = min(ttl, timeout)
+        if ttl <= 0:
+            self._l1_delete(cache_key)
+            return
+        with self._lock:
+            self._l1[cache_key] = (value, time.monotonic() + ttl)
+            self._l1.move_to_end(cache_key)
+            while len(self._l1) > self._l1_max_entries:
+                self._l1.popitem(last=False)
+
+    def _l1_delete(self, cache_key):
+        with self._lock:
+            self._l1.pop(cache_key, None)
+
+    def get(self, key, default=None, version=None):
+        cache_key = self.make_key(key, version)
+        if self._l1_enabled(key):
+            value = self._l1_get(cache_key)
+            if value is not MISSING:
+                self._count(key, 'l1_hits')
+                return value
+            self._count(key, 'l1_misses')
+        value = self.l2.get(key, MISSING, version=version)
+        if value is MISSING:
+            self._count(key, 'l2_misses')
+            return default
+        self._count(key, 'l2_hits')
+        self._l1_set(key, cache_key, value, DEFAULT_TIMEOUT)
+        return value
+
+    def get_many(self, keys, version=None):
+        found = {}
+        l2_keys = []
+        for key in keys:
+            value = MISSING
+            if self._l1_enabled(key):
+                value = self._l1_get(self.make_key(key, version))
+                self._count(
+                    key, 'l1_misses' if value is MISSING else 'l1_hits')
+            if value is MISSING:
+                l2_keys.append(key)
+            else:
+                found[key] = value
+        if l2_keys:
+            l2_found = self.l2.get_many(l2_keys, version=version)
+            for key in l2_keys:
+                if key in l2_found:
+                    self._count(key, 'l2_hits')
+                    self._l1_set(key, self.make_key(key, version),
+                                 l2_found[key], DEFAULT_TIMEOUT)
+                else:
+                    self._count(key, 'l2_misses')
+            found.update(l2_found)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout = self._timeout(key, timeout)
+        self.l2.set(key, value, timeout, version=version)
+        self._l1_set(key, self.make_key(key, version), value, timeout)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        for key, value in data.items():
+            self.set(key, value, timeout, version=version)
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout = self._timeout(key, timeout)
+        added = self.l2.add(key, value, timeout, version=version)
+        if added:
+            self._l1_set(key, self.make_key(key, version), value, timeout)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout = self._timeout(key, timeout)
+        return self.l2.touch(key, timeout, version=version)
+
+    def delete(self, key, version=None):
+        self._l1_delete(self.make_key(key, version))
+        return self.l2.delete(key, version=version)
+
+    def delete_many(self, keys, version=None):
+        for key in keys:
+            self._l1_delete(self.make_key(key, version))
+        self.l2.delete_many(keys, version=version)
+
+    def has_key(self, key, version=None):
+        return self.get(key, MISSING, version=version) is not MISSING
+
+    def incr(self, key, delta=1, version=None):
+        self._l1_delete(self.make_key(key, version))
+        return self.l2.incr(key, delta, version=version)
+
+    def decr(self, key, delta=1, version=None):
+        return self.incr(key, -delta, version=version)
+
+    def clear(self):
+        with self._lock:
+            self._l1.clear()
+        self.l2.clear()
+
+    def close(self, **kwargs):
+        self.l2.close(**kwargs)
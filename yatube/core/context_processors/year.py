@@ -1,8 +1,8 @@
-from datetime import date
+from core.rendering import current_year
 
 
 def year(request):
     """Добавляет переменную с текущим годом."""
     return {
-        'year': date.today().year,
+        'year': current_year(),
     }
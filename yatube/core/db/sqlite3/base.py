@@ -0,0 +1,70 @@
+"""SQLite с настройками для веб-приложения.
+
+Обычный бэкенд django.db.backends.sqlite3, который при подключении
+выставляет PRAGMA:
+
+* journal_mode=WAL — читатели не ждут писателя и не мешают ему;
+* synchronous=NORMAL — в режиме WAL fsync только на контрольных точках,
+  после сбоя питания теряются последние транзакции, но база цела;
+* busy_timeout — сколько миллисекунд ждать занятую блокировку, прежде
+  чем отвечать «database is locked»;
+* cache_size и mmap_size — кэш страниц соединения и отображение файла
+  в память;
+* temp_store=MEMORY — временные таблицы и индексы сортировок в памяти.
+
+Значения по умолчанию — PRAGMAS; переопределить их можно словарём
+'pragmas' в OPTIONS базы. OPTIONS['transaction_mode'] — как начинать
+транзакции: с IMMEDIATE транзакция сразу берёт блокировку записи и
+ждёт её busy_timeout, а не падает с «database is locked», когда
+читающая транзакция пытается начать запись после чужого коммита.
+
+Постоянные соединения включаются обычным CONN_MAX_AGE: PRAGMA
+выполняются один раз на соединение.
+"""
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    # Отрицательное значение — размер в КиБ, а не в страницах.
+    'cache_size': -20000,
+    'mmap_size': 256 * 2 ** 20,
+    'temp_store': 'MEMORY',
+}
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+# Ключи OPTIONS этого бэкенда; остальные передаются в sqlite3.connect.
+OWN_OPTIONS = ('pragmas', 'transaction_mode')
+
+
+def apply_pragmas(connection, pragmas):
+    """Выполняет на открытом соединении sqlite3 ровно эти PRAGMA."""
+    for name, value in pragmas.items():
+        connection.execute(f'PRAGMA {name} = {value}')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def get_connection_params(self):
+        mode = self.transaction_mode()
+        if mode not in TRANSACTION_MODES:
+            raise ImproperlyConfigured(
+                f'Неизвестный transaction_mode SQLite: {mode}.')
+        params = super().get_connection_params()
+        for option in OWN_OPTIONS:
+            params.pop(option, None)
+        return params
+
+    def get_new_connection(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        apply_pragmas(connection, {
+            **PRAGMAS, **self.settings_dict['OPTIONS'].get('pragmas', {})})
+        return connection
+
+    def transaction_mode(self):
+        return self.settings_dict['OPTIONS'].get(
+            'transaction_mode', 'DEFERRED').upper()
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute(f'BEGIN {self.transaction_mode()}')
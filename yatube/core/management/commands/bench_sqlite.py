@@ -0,0 +1,183 @@
+import json
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.db.sqlite3.base import PRAGMAS, apply_pragmas
+
+# Настройки, которые сравниваются: PRAGMA и начало транзакции записи.
+# stock — как у django.db.backends.sqlite3: журнал отката, полный
+# fsync и ожидание блокировки 5 секунд (timeout sqlite3.connect).
+PROFILES = {
+    'stock': ({'journal_mode': 'DELETE', 'synchronous': 'FULL',
+               'busy_timeout': 5000}, 'DEFERRED'),
+    'tuned': (PRAGMAS, 'IMMEDIATE'),
+}
+SCHEMA = (
+    'CREATE TABLE comment (id INTEGER PRIMARY KEY AUTOINCREMENT, '
+    'post_id INTEGER NOT NULL, text TEXT NOT NULL, created REAL NOT NULL)',
+    'CREATE INDEX comment_post_created ON comment (post_id, created)',
+    'CREATE TABLE post (id INTEGER PRIMARY KEY, '
+    'comments_count INTEGER NOT NULL)',
+)
+READ_SQL = ('SELECT id, text FROM comment WHERE post_id = ? '
+            'ORDER BY created DESC LIMIT 50')
+
+
+def connect(path, pragmas):
+    connection = sqlite3.connect(path, isolation_level=None)
+    apply_pragmas(connection, pragmas)
+    return connection
+
+
+def prepare(path, pragmas, posts, rows):
+    connection = connect(path, pragmas)
+    with connection:
+        for statement in SCHEMA:
+            connection.execute(statement)
+        connection.executemany(
+            'INSERT INTO post VALUES (?, 0)',
+            ((pk,) for pk in range(posts)))
+        connection.executemany(
+            'INSERT INTO comment (post_id, text, created) VALUES (?, ?, ?)',
+            ((pk % posts, 'комментарий ' * 5, pk) for pk in range(rows)))
+    connection.close()
+
+
+class Worker(threading.Thread):
+    """Поток нагрузки со своим соединением к базе."""
+
+    def __init__(self, path, pragmas, posts, deadline, seed):
+        super().__init__(daemon=True)
+        self.path = path
+        self.pragmas = pragmas
+        self.posts = posts
+        self.deadline = deadline
+        self.random = random.Random(seed)
+        self.operations = 0
+        self.errors = 0
+        self.latencies = []
+
+    def run(self):
+        connection = connect(self.path, self.pragmas)
+        try:
+            while time.monotonic() < self.deadline:
+                start = time.perf_counter()
+                try:
+                    self.operation(connection)
+                except sqlite3.OperationalError:
+                    # «database is locked»: ожидание блокировки истекло
+                    # или его нельзя было ждать.
+                    self.errors += 1
+                    if connection.in_transaction:
+                        connection.execute('ROLLBACK')
+                    continue
+                self.latencies.append(time.perf_counter() - start)
+                self.operations += 1
+        finally:
+            connection.close()
+
+
+class Reader(Worker):
+
+    def operation(self, connection):
+        connection.execute(
+            READ_SQL, [self.random.randrange(self.posts)]).fetchall()
+
+
+class Writer(Worker):
+
+    def __init__(self, *args, transaction_mode, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.transaction_mode = transaction_mode
+
+    def operation(self, connection):
+        # Как сохранение комментария: проверка поста, вставка
+        # и сдвиг счётчика одной транзакцией.
+        post_id = self.random.randrange(self.posts)
+        connection.execute(f'BEGIN {self.transaction_mode}')
+        connection.execute(
+            'SELECT id FROM post WHERE id = ?', [post_id]).fetchone()
+        connection.execute(
+            'INSERT INTO comment (post_id, text, created) VALUES (?, ?, ?)',
+            [post_id, 'новый комментарий', time.time()])
+        connection.execute(
+            'UPDATE post SET comments_count = comments_count + 1 '
+            'WHERE id = ?', [post_id])
+        connection.execute('COMMIT')
+
+
+def percentile_ms(values, percent):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(int(len(ordered) * percent / 100), len(ordered) - 1)
+    return round(ordered[index] * 1000, 2)
+
+
+def run_profile(directory, name, options):
+    pragmas, transaction_mode = PROFILES[name]
+    path = os.path.join(directory, f'{name}.sqlite3')
+    prepare(path, pragmas, options['posts'], options['rows'])
+    deadline = time.monotonic() + options['seconds']
+    args = (path, pragmas, options['posts'], deadline)
+    readers = [Reader(*args, seed) for seed in range(options['readers'])]
+    writers = [Writer(*args, seed, transaction_mode=transaction_mode)
+               for seed in range(options['writers'])]
+    for worker in readers + writers:
+        worker.start()
+    for worker in readers + writers:
+        worker.join()
+    result = {}
+    for kind, workers in (('reads', readers), ('writes', writers)):
+        latencies = [value for worker in workers
+                     for value in worker.latencies]
+        operations = sum(worker.operations for worker in workers)
+        result[kind] = {
+            'per_second': round(operations / options['seconds'], 1),
+            'p95_ms': percentile_ms(latencies, 95),
+            'errors': sum(worker.errors for worker in workers),
+        }
+    return result
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает пропускную способность SQLite с настройками '
+            'по умолчанию и с настройками core.db.sqlite3 при '
+            'одновременных чтении и записи. Базы создаются во временном '
+            'каталоге.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seconds', type=float, default=5)
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--writers', type=int, default=4)
+        parser.add_argument('--posts', type=int, default=100)
+        parser.add_argument('--rows', type=int, default=50000)
+        parser.add_argument('--output', help='JSON-файл для отчёта.')
+
+    def handle(self, *args, **options):
+        if options['seconds'] <= 0 or options['posts'] < 1:
+            raise CommandError('--seconds и --posts должны быть больше нуля.')
+        directory = tempfile.mkdtemp(prefix='bench-sqlite-')
+        report = {}
+        try:
+            for name in PROFILES:
+                report[name] = run_profile(directory, name, options)
+                self.write_result(name, report[name])
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                json.dump(report, output, indent=2)
+
+    def write_result(self, name, result):
+        for kind, values in result.items():
+            self.stdout.write(
+                f'{name} {kind}: {values["per_second"]}/с, '
+                f'p95 {values["p95_ms"]} мс, ошибок {values["errors"]}')
@@ -0,0 +1,257 @@
+"""Метрики запросов и процесса.
+
+InstrumentationMiddleware заводит на время запроса объект RequestMetrics
+в contextvar; код приложения отмечает события через incr() и timer().
+В конце запроса его метрики добавляются в общий для процесса registry
+с меткой представления. События вне запроса (например, миниатюры из
+фонового пула) попадают в registry сразу.
+
+Каждый процесс периодически сохраняет registry в свой файл в
+METRICS_DIR; exposition() складывает файлы всех процессов и отдаёт их
+в текстовом формате Prometheus. Файлы умерших процессов продолжают
+учитываться, чтобы счётчики не убывали; каталог стоит очищать при
+перезапуске приложения.
+
+Вне запроса при выключенной инструментации incr() и timer() почти
+ничего не стоят.
+"""
+import atexit
+import json
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+PREFIX = 'yatube_'
+DURATION_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+HELP = {
+    'request_duration_seconds': 'Время ответа по представлениям.',
+    'requests': 'Ответы по представлениям и кодам.',
+    'db_queries': 'SQL-запросы по представлениям.',
+    'db_query_seconds': 'Время SQL-запросов по представлениям.',
+    'template_seconds': 'Время рендеринга шаблонов по представлениям.',
+    'cache_hits': 'Попадания в кэш по уровням и пространствам имён.',
+    'cache_misses': 'Промахи кэша по уровням и пространствам имён.',
+    'uploads': 'Принятые картинки.',
+    'upload_bytes': 'Объём принятых картинок.',
+    'uploads_rejected': 'Отклонённые картинки.',
+    'thumbnails': 'Построенные наборы миниатюр.',
+    'thumbnails_queued': 'Миниатюры, поставленные в очередь.',
+    'comments_queued': 'Комментарии, поставленные в очередь записи.',
+    'comment_batches': 'Записанные пачки комментариев.',
+    'comment_retries': 'Повторы записи комментариев в занятую базу.',
+}
+
+_current = ContextVar('request_metrics', default=None)
+
+
+def metric_key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+class RequestMetrics:
+
+    def __init__(self):
+        # Счётчики по (имя, метки).
+        self.counts = Counter()
+        # Миллисекунды по именам таймеров.
+        self.durations = Counter()
+        self._active = set()
+
+    def totals(self):
+        """Счётчики по именам без меток."""
+        totals = Counter()
+        for (name, _), amount in self.counts.items():
+            totals[name] += amount
+        return totals
+
+
+class Registry:
+    """Накопленные метрики процесса."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = Counter()
+        # (имя, метки) -> [счётчики по корзинам, сумма, число].
+        self.histograms = {}
+        self.flushed_at = 0.0
+        self.filename = f'{os.getpid()}-{int(time.time() * 1000)}.json'
+
+    def add(self, key, amount):
+        with self._lock:
+            self.counters[key] += amount
+
+    def _observe(self, key, value):
+        buckets, total, count = self.histograms.get(
+            key, ([0] * len(DURATION_BUCKETS), 0.0, 0))
+        buckets = [hits + (value <= bound)
+                   for hits, bound in zip(buckets, DURATION_BUCKETS)]
+        self.histograms[key] = (buckets, total + value, count + 1)
+
+    def observe_request(self, view, status, seconds, request_metrics):
+        view_labels = (('view', view or 'unresolved'),)
+        durations = request_metrics.durations
+        with self._lock:
+            self._observe(('request_duration_seconds', view_labels), seconds)
+            self.counters['requests', (
+                ('status', str(status)), *view_labels)] += 1
+            self.counters['db_query_seconds', view_labels] += (
+                durations['sql'] / 1000)
+            self.counters['template_seconds', view_labels] += (
+                durations['template'] / 1000)
+            for (name, labels), amount in request_metrics.counts.items():
+                if name == 'sql':
+                    name, labels = 'db_queries', view_labels
+                self.counters[name, labels] += amount
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'counters': [[name, labels, value] for (name, labels), value
+                             in self.counters.items()],
+                'histograms': [[name, labels, *data] for (name, labels), data
+                               in self.histograms.items()],
+            }
+
+    def flush(self, directory):
+        """Атомарно сохраняет метрики процесса в его файл."""
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, self.filename)
+        temporary = f'{path}.tmp'
+        with open(temporary, 'w', encoding='utf-8') as snapshot_file:
+            json.dump(self.snapshot(), snapshot_file)
+        os.replace(temporary, path)
+        self.flushed_at = time.monotonic()
+
+    def maybe_flush(self, directory, interval):
+        if time.monotonic() - self.flushed_at >= interval:
+            self.flush(directory)
+
+
+registry = Registry()
+
+
+@atexit.register
+def flush_on_exit():
+    if settings.configured and settings.INSTRUMENTATION_ENABLED:
+        if registry.counters or registry.histograms:
+            registry.flush(settings.METRICS_DIR)
+
+
+def start():
+    """Начинает сбор метрик; возвращает их и токен для stop()."""
+    request_metrics = RequestMetrics()
+    return request_metrics, _current.set(request_metrics)
+
+
+def stop(token):
+    _current.reset(token)
+
+
+def incr(name, amount=1, **labels):
+    key = metric_key(name, labels)
+    request_metrics = _current.get()
+    if request_metrics is not None:
+        request_metrics.counts[key] += amount
+    elif settings.INSTRUMENTATION_ENABLED:
+        registry.add(key, amount)
+
+
+@contextmanager
+def timer(name):
+    """Добавляет к таймеру name время блока; вложенные замеры одного
+    таймера не суммируются дважды."""
+    request_metrics = _current.get()
+    if request_metrics is None or name in request_metrics._active:
+        yield
+        return
+    request_metrics._active.add(name)
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        request_metrics.durations[name] += (
+            time.perf_counter() - start_time) * 1000
+        request_metrics._active.discard(name)
+
+
+def sql_wrapper(execute, sql, params, many, context):
+    """Обёртка для connection.execute_wrapper: число и время запросов."""
+    incr('sql')
+    with timer('sql'):
+        return execute(sql, params, many, context)
+
+
+def collect(directory):
+    """Сумма метрик из файлов всех процессов."""
+    counters = Counter()
+    histograms = {}
+    for filename in os.listdir(directory):
+        if not filename.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(directory, filename),
+                      encoding='utf-8') as snapshot_file:
+                snapshot = json.load(snapshot_file)
+        except (OSError, ValueError):
+            continue
+        for name, labels, value in snapshot['counters']:
+            counters[name, tuple(map(tuple, labels))] += value
+        for name, labels, buckets, total, count in snapshot['histograms']:
+            key = name, tuple(map(tuple, labels))
+            old_buckets, old_total, old_count = histograms.get(
+                key, ([0] * len(buckets), 0.0, 0))
+            histograms[key] = (
+                [a + b for a, b in zip(old_buckets, buckets)],
+                old_total + total, old_count + count)
+    return counters, histograms
+
+
+def format_labels(labels, **extra):
+    pairs = [*labels, *extra.items()]
+    if not pairs:
+        return ''
+    escaped = (
+        '{}="{}"'.format(key, str(value).replace('\\', '\\\\')
+                         .replace('"', '\\"').replace('\n', '\\n'))
+        for key, value in pairs
+    )
+    return '{' + ','.join(escaped) + '}'
+
+
+def header(lines, name, metric_type, suffix=''):
+    if name in HELP:
+        lines.append(f'# HELP {PREFIX}{name}{suffix} {HELP[name]}')
+    lines.append(f'# TYPE {PREFIX}{name}{suffix} {metric_type}')
+
+
+def exposition(directory):
+    """Метрики всех процессов в текстовом формате Prometheus."""
+    counters, histograms = collect(directory)
+    lines = []
+    for name in sorted({name for name, _ in histograms}):
+        header(lines, name, 'histogram')
+        for (metric, labels), (buckets, total, count) in sorted(
+                histograms.items()):
+            if metric != name:
+                continue
+            for bound, hits in zip(DURATION_BUCKETS, buckets):
+                lines.append(f'{PREFIX}{name}_bucket'
+                             f'{format_labels(labels, le=bound)} {hits}')
+            lines.append(f'{PREFIX}{name}_bucket'
+                         f'{format_labels(labels, le="+Inf")} {count}')
+            lines.append(f'{PREFIX}{name}_sum{format_labels(labels)} {total}')
+            lines.append(
+                f'{PREFIX}{name}_count{format_labels(labels)} {count}')
+    for name in sorted({name for name, _ in counters}):
+        header(lines, name, 'counter', '_total')
+        for (metric, labels), value in sorted(counters.items()):
+            if metric == name:
+                lines.append(
+                    f'{PREFIX}{name}_total{format_labels(labels)} {value}')
+    return '\n'.join(lines) + '\n'
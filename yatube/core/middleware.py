@@ -0,0 +1,89 @@
+import json
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def server_timing(request_metrics, total_ms):
+    """Значение заголовка Server-Timing для панели браузера."""
+    counts = request_metrics.totals()
+    durations = request_metrics.durations
+    entries = [
+        f'total;dur={total_ms:.1f}',
+        f'db;dur={durations["sql"]:.1f};desc="{counts["sql"]} queries"',
+        f'tpl;dur={durations["template"]:.1f}',
+    ]
+    for name, count in sorted(counts.items()):
+        if name != 'sql':
+            entries.append(f'{name};desc="{count}"')
+    return ', '.join(entries)
+
+
+class InstrumentationMiddleware:
+    """Число и время SQL-запросов, время рендеринга шаблонов, попадания
+    в кэш и построенные миниатюры каждого запроса.
+
+    Метрики уходят в заголовок Server-Timing и строкой JSON в лог
+    core.middleware. Запросы, превысившие бюджет SQL-запросов
+    представления (QUERY_BUDGETS, по умолчанию QUERY_BUDGET), пишутся
+    в лог с уровнем WARNING. При INSTRUMENTATION_ENABLED = False
+    middleware отключается целиком.
+    """
+
+    def __init__(self, get_response):
+        if not settings.INSTRUMENTATION_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request_metrics, token = metrics.start()
+        start_time = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(metrics.sql_wrapper))
+                response = self.get_response(request)
+        finally:
+            metrics.stop(token)
+        total_ms = (time.perf_counter() - start_time) * 1000
+        response['Server-Timing'] = server_timing(request_metrics, total_ms)
+        self.log(request, response, request_metrics, total_ms)
+        match = request.resolver_match
+        metrics.registry.observe_request(
+            match.view_name if match else None, response.status_code,
+            total_ms / 1000, request_metrics)
+        metrics.registry.maybe_flush(
+            settings.METRICS_DIR, settings.METRICS_FLUSH_INTERVAL)
+        return response
+
+    def log(self, request, response, request_metrics, total_ms):
+        match = request.resolver_match
+        view_name = match.view_name if match else None
+        counts = request_metrics.totals()
+        budget = settings.QUERY_BUDGETS.get(view_name, settings.QUERY_BUDGET)
+        over_budget = budget is not None and counts['sql'] > budget
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'view': view_name,
+            'status': response.status_code,
+            'duration_ms': round(total_ms, 2),
+            'sql_count': counts['sql'],
+            'sql_ms': round(request_metrics.durations['sql'], 2),
+            'template_ms': round(request_metrics.durations['template'], 2),
+            **{name: count for name, count in counts.items()
+               if name != 'sql'},
+            'query_budget': budget,
+            'over_budget': over_budget,
+        }
+        level = logging.WARNING if over_budget else logging.INFO
+        logger.log(level, json.dumps(record, ensure_ascii=False))
@@ -0,0 +1,53 @@
+"""Помощники рендеринга: значения, которые шаблоны иначе считали бы
+заново для каждой карточки поста или каждого запроса."""
+import time
+from datetime import date, datetime
+from functools import lru_cache
+
+from django.core.exceptions import ObjectDoesNotExist
+from django.utils import translation
+from django.utils.dateformat import format as format_date
+
+# (год, time.time() начала следующего года)
+_year = (None, 0)
+
+
+@lru_cache(maxsize=4096)
+def _formatted_date(day, format_string, language):
+    return format_date(day, format_string)
+
+
+def local_date(value, format_string):
+    """Как фильтр date, но только для форматов из частей даты: строка
+    запоминается по дню, формату и языку, и названия месяцев
+    не переводятся для каждой карточки заново."""
+    if not value:
+        return ''
+    if isinstance(value, datetime):
+        value = value.date()
+    return _formatted_date(value, format_string, translation.get_language())
+
+
+def display_name(user):
+    """Подпись автора, которая хранится в профиле пользователя."""
+    return user.get_full_name()
+
+
+def author_name(user):
+    """Подпись автора из профиля: профиль читается вместе с автором
+    через select_related('profile'). Без профиля подпись пустая."""
+    try:
+        return user.profile.display_name
+    except ObjectDoesNotExist:
+        return ''
+
+
+def current_year():
+    """Текущий год; пересчитывается, когда наступает следующий."""
+    global _year
+    year, next_year_at = _year
+    if time.time() >= next_year_at:
+        year = date.today().year
+        next_year_at = time.mktime((year + 1, 1, 1, 0, 0, 0, 0, 0, -1))
+        _year = (year, next_year_at)
+    return year
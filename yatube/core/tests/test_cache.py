@@ -0,0 +1,71 @@
+from django.core.cache import caches
+from django.test import SimpleTestCase, override_settings
+
+TIERED_CACHES = {
+    'default': {
+        'BACKEND': 'core.cache.TieredCache',
+        'OPTIONS': {
+            'L2': 'shared',
+            'L1_MAX_ENTRIES': 2,
+            'L1_TIMEOUT': 60,
+            'NAMESPACES': {
+                'version': {'TIMEOUT': None, 'L1': False},
+            },
+        },
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'tiered-cache-tests',
+    },
+}
+
+
+@override_settings(CACHES=TIERED_CACHES)
+class TieredCacheTest(SimpleTestCase):
+
+    def setUp(self):
+        self.cache = caches['default']
+        self.shared = caches['shared']
+        self.cache.clear()
+        self.cache.reset_stats()
+
+    def test_read_through(self):
+        """Значение из L2 попадает в L1 и читается оттуда."""
+        self.shared.set('key', 'value')
+        self.assertEqual(self.cache.get('key'), 'value')
+        self.assertEqual(self.cache.get('key'), 'value')
+        stats = self.cache.stats()
+        self.assertEqual(stats['l2_hits'], 1)
+        self.assertEqual(stats['l1_hits'], 1)
+
+    def test_write_through(self):
+        self.cache.set('key', 'value')
+        self.assertEqual(self.shared.get('key'), 'value')
+        self.cache.delete('key')
+        self.assertIsNone(self.shared.get('key'))
+        self.assertIsNone(self.cache.get('key'))
+
+    def test_l1_is_lru(self):
+        """L1 держит не больше L1_MAX_ENTRIES последних ключей."""
+        for key in ('a', 'b', 'c'):
+            self.cache.set(key, key)
+        self.shared.delete_many(['a', 'b', 'c'])
+        self.assertIsNone(self.cache.get('a'))
+        self.assertEqual(self.cache.get('c'), 'c')
+
+    def test_namespace_bypasses_l1(self):
+        """Ключи пространства с 'L1': False всегда читаются из L2."""
+        self.cache.set('version:index', 'v1')
+        self.shared.set('version:index', 'v2')
+        self.assertEqual(self.cache.get('version:index'), 'v2')
+        self.assertNotIn('l1_hits', self.cache.stats())
+
+    def test_get_many(self):
+        self.cache.set('a', 1)
+        self.shared.set('b', 2)
+        self.assertEqual(
+            self.cache.get_many(['a', 'b', 'c']), {'a': 1, 'b': 2})
+        stats = self.cache.stats()
+        self.assertEqual(stats['l1_hits'], 1)
+        self.assertEqual(stats['l2_hits'], 1)
+        self.assertEqual(stats['l2_misses'], 1)
@@ -0,0 +1,75 @@
+import os
+import tempfile
+from io import StringIO
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+
+from ..db.sqlite3.base import DatabaseWrapper
+from ..management.commands.bench_sqlite import PROFILES, connect
+
+
+class SQLiteBackendTest(TestCase):
+
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas_applied(self):
+        self.assertEqual(self.pragma('synchronous'), 1)
+        self.assertEqual(self.pragma('temp_store'), 2)
+        self.assertEqual(self.pragma('busy_timeout'), 5000)
+        self.assertEqual(self.pragma('cache_size'), -20000)
+
+    def test_wal_on_file_database(self):
+        with tempfile.TemporaryDirectory() as directory:
+            wrapper = DatabaseWrapper({
+                **connection.settings_dict,
+                'NAME': os.path.join(directory, 'test.sqlite3'),
+                'OPTIONS': {'pragmas': {'cache_size': -1000}},
+            })
+            try:
+                with wrapper.cursor() as cursor:
+                    cursor.execute('PRAGMA journal_mode')
+                    self.assertEqual(cursor.fetchone()[0], 'wal')
+                    cursor.execute('PRAGMA cache_size')
+                    self.assertEqual(cursor.fetchone()[0], -1000)
+            finally:
+                wrapper.close()
+
+    def test_unknown_transaction_mode(self):
+        wrapper = DatabaseWrapper({
+            **connection.settings_dict,
+            'OPTIONS': {'transaction_mode': 'sometimes'},
+        })
+        with self.assertRaises(ImproperlyConfigured):
+            wrapper.get_connection_params()
+
+
+class BenchSQLiteCommandTest(SimpleTestCase):
+
+    def test_reports_both_profiles(self):
+        out = StringIO()
+        call_command('bench_sqlite', seconds=0.2, readers=1, writers=1,
+                     rows=100, stdout=out)
+        for line in ('stock reads', 'stock writes', 'tuned reads',
+                     'tuned writes'):
+            self.assertIn(line, out.getvalue())
+
+    def test_stock_profile_keeps_sqlite_defaults(self):
+        """Профиль stock не получает PRAGMA настроенного бэкенда."""
+        pragmas, _ = PROFILES['stock']
+        with tempfile.TemporaryDirectory() as directory:
+            connection = connect(
+                os.path.join(directory, 'stock.sqlite3'), pragmas)
+            try:
+                for name, default in (('cache_size', -2000),
+                                      ('mmap_size', 0), ('temp_store', 0)):
+                    with self.subTest(pragma=name):
+                        self.assertEqual(connection.execute(
+                            f'PRAGMA {name}').fetchone()[0], default)
+            finally:
+                connection.close()
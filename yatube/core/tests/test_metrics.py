@@ -0,0 +1,92 @@
+import json
+import os
+import re
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from posts.models import Post, User
+
+from .. import metrics
+
+METRICS_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def sample(text, name, **labels):
+    """Сумма значений метрики name с метками labels из /metrics."""
+    total = 0.0
+    pattern = '^' + re.escape(name) + r'(?:\{([^}]*)\})? (\S+)$'
+    for match in re.finditer(pattern, text, re.MULTILINE):
+        pairs = dict(re.findall(r'(\w+)="([^"]*)"', match.group(1) or ''))
+        if all(pairs.get(key) == value for key, value in labels.items()):
+            total += float(match.group(2))
+    return total
+
+
+@override_settings(METRICS_DIR=METRICS_DIR)
+class MetricsEndpointTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='HasNoName')
+        Post.objects.create(author=cls.user, text='Тестовый текст')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(METRICS_DIR, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def scrape(self):
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        return response.content.decode()
+
+    def test_view_metrics(self):
+        """Время ответа, SQL-запросы и кэш фрагментов по представлениям."""
+        before = self.scrape()
+        for _ in range(2):
+            self.authorized_client.get(reverse('posts:index'))
+        after = self.scrape()
+        name = 'yatube_request_duration_seconds_count'
+        self.assertEqual(
+            sample(after, name, view='posts:index')
+            - sample(before, name, view='posts:index'), 2)
+        self.assertIn('yatube_request_duration_seconds_bucket{'
+                      'view="posts:index",le="+Inf"}', after)
+        self.assertGreater(
+            sample(after, 'yatube_db_queries_total', view='posts:index'), 0)
+        fragment = {'namespace': 'template.cache'}
+        self.assertGreater(
+            sample(after, 'yatube_cache_hits_total', **fragment)
+            - sample(before, 'yatube_cache_hits_total', **fragment), 0)
+
+    def test_background_events_counted(self):
+        before = sample(self.scrape(), 'yatube_thumbnails_total')
+        metrics.incr('thumbnails')
+        after = sample(self.scrape(), 'yatube_thumbnails_total')
+        self.assertEqual(after - before, 1)
+
+    def test_workers_aggregated(self):
+        """Метрики других процессов складываются с метриками текущего."""
+        before = sample(self.scrape(), 'yatube_uploads_total')
+        with open(os.path.join(METRICS_DIR, 'other.json'), 'w') as other:
+            json.dump({'counters': [['uploads', [], 5]],
+                       'histograms': []}, other)
+        try:
+            after = sample(self.scrape(), 'yatube_uploads_total')
+        finally:
+            os.remove(os.path.join(METRICS_DIR, 'other.json'))
+        self.assertEqual(after - before, 5)
+
+    @override_settings(METRICS_ALLOWED_IPS=[])
+    def test_hidden_from_other_hosts(self):
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 404)
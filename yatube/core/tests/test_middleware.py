@@ -0,0 +1,65 @@
+import json
+
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from posts.models import Post, User
+
+
+class InstrumentationMiddlewareTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='HasNoName')
+        cls.post = Post.objects.create(author=cls.user, text='Тестовый текст')
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_server_timing(self):
+        """Ответ несёт число и время SQL-запросов, время шаблонов
+        и обращения к кэшу."""
+        response = self.authorized_client.get(reverse('posts:index'))
+        timing = response['Server-Timing']
+        self.assertIn('total;dur=', timing)
+        self.assertRegex(timing, r'db;dur=[\d.]+;desc="[1-9]\d* queries"')
+        self.assertRegex(timing, r'tpl;dur=\d+\.\d')
+        self.assertIn('cache_', timing)
+
+    def test_log_line(self):
+        with self.assertLogs('core.middleware', 'INFO') as logs:
+            self.authorized_client.get(
+                reverse('posts:post_detail', args=[self.post.pk]))
+        record = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(record['view'], 'posts:post_detail')
+        self.assertEqual(record['status'], 200)
+        self.assertGreater(record['sql_count'], 0)
+        self.assertFalse(record['over_budget'])
+
+    @override_settings(QUERY_BUDGETS={'posts:index': 1})
+    def test_over_budget_warning(self):
+        with self.assertLogs('core.middleware', 'WARNING') as logs:
+            self.authorized_client.get(reverse('posts:index'))
+        record = json.loads(logs.records[-1].getMessage())
+        self.assertTrue(record['over_budget'])
+        self.assertEqual(record['query_budget'], 1)
+
+    def test_feeds_within_budget(self):
+        """Ленты укладываются в бюджеты из настроек."""
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:profile', args=[self.user]),
+            reverse('posts:follow_index'),
+            reverse('posts:post_detail', args=[self.post.pk]),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                with self.assertLogs('core.middleware', 'INFO') as logs:
+                    self.authorized_client.get(url)
+                self.assertEqual(logs.records[-1].levelname, 'INFO')
+
+    @override_settings(INSTRUMENTATION_ENABLED=False)
+    def test_disabled(self):
+        response = Client().get(reverse('posts:index'))
+        self.assertNotIn('Server-Timing', response)
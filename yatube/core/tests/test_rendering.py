@@ -0,0 +1,58 @@
+from datetime import date, datetime
+
+from django.contrib.auth import get_user_model
+from django.template import Context, Template
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone, translation
+
+from .. import rendering
+
+User = get_user_model()
+
+
+class LocalDateTest(SimpleTestCase):
+
+    def test_matches_date_filter(self):
+        value = timezone.make_aware(datetime(2021, 3, 8, 23, 30))
+        context = Context({'value': value})
+        template = Template(
+            '{% load post_filters %}{{ value|local_date:"d E Y" }}|'
+            '{{ value|date:"d E Y" }}')
+        cached, plain = template.render(context).split('|')
+        self.assertEqual(cached, plain)
+        self.assertEqual(cached, '08 марта 2021')
+
+    def test_formatted_once_per_language(self):
+        rendering._formatted_date.cache_clear()
+        day = date(2021, 3, 8)
+        rendering.local_date(day, 'd E Y')
+        self.assertEqual(rendering.local_date(day, 'd E Y'), '08 марта 2021')
+        with translation.override('en'):
+            self.assertEqual(
+                rendering.local_date(day, 'd E Y'), '08 March 2021')
+        info = rendering._formatted_date.cache_info()
+        self.assertEqual((info.hits, info.misses), (1, 2))
+
+    def test_empty_value(self):
+        self.assertEqual(rendering.local_date(None, 'd E Y'), '')
+
+    def test_current_year(self):
+        self.assertEqual(rendering.current_year(), date.today().year)
+
+
+class DisplayNameTest(TestCase):
+
+    def test_display_name_follows_user(self):
+        user = User.objects.create(
+            username='leo', first_name='Лев', last_name='Толстой')
+        self.assertEqual(rendering.author_name(user), 'Лев Толстой')
+        user.last_name = 'Николаевич'
+        user.save()
+        user = User.objects.select_related('profile').get(pk=user.pk)
+        self.assertEqual(rendering.author_name(user), 'Лев Николаевич')
+
+    def test_user_without_profile(self):
+        user = User.objects.create(username='leo')
+        user.profile.delete()
+        user = User.objects.select_related('profile').get(pk=user.pk)
+        self.assertEqual(rendering.author_name(user), '')
@@ -1,5 +1,9 @@
+from django.conf import settings
+from django.http import Http404, HttpResponse
 from django.shortcuts import render
 
+from . import metrics
+
 
 def page_not_found(request, exception):
     return render(request, 'core/404.html', {'path': request.path}, status=404)
@@ -15,3 +19,16 @@ def permission_denied_view(request, exception):
 
 def server_error(request, reason=''):
     return render(request, 'core/500.html')
+
+
+def prometheus_metrics(request):
+    """Метрики всех процессов приложения в формате Prometheus."""
+    if (not settings.INSTRUMENTATION_ENABLED
+            or request.META.get('REMOTE_ADDR')
+            not in settings.METRICS_ALLOWED_IPS):
+        raise Http404
+    metrics.registry.flush(settings.METRICS_DIR)
+    return HttpResponse(
+        metrics.exposition(settings.METRICS_DIR),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
@@ -0,0 +1,173 @@
+"""JSON API только для чтения: ленты, пост и его комментарии.
+
+Ответы отдаются с ETag и Last-Modified. ETag строится из версий лент
+(posts.cache) и параметров запроса, поэтому меняется при любом
+изменении поста или комментария. Комментарии меняют только версию
+поста, поэтому число комментариев отдаётся с постом, а не в лентах.
+Last-Modified — дата самой новой
+записи, а для поста — время его правки. На условный запрос
+с неизменившимися данными API отвечает 304, не загружая и не сериализуя
+записи. Правка поста не двигает дату ленты, поэтому клиентам стоит
+присылать If-None-Match: If-Modified-Since проверяется, только когда
+ETag в запросе нет.
+"""
+import hashlib
+import json
+
+from core.rendering import author_name
+from django.db.models import Max
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.http import require_safe
+
+from .cache import feed_version
+from .models import Group, Post, User
+from .paginators import comments_page, encode_cursor, paginate
+
+
+def render_json(payload):
+    # Данные уже сведены к строкам, числам и словарям, поэтому их
+    # кодирует C-реализация json без обращений к default().
+    return HttpResponse(
+        json.dumps(payload, ensure_ascii=False, separators=(',', ':')),
+        content_type='application/json',
+    )
+
+
+def conditional(request, scopes, last_modified, build):
+    """Ответ 304, если у клиента актуальная версия, иначе build()."""
+    raw = f'{feed_version(*scopes)}|{request.GET.urlencode()}'
+    etag = quote_etag(hashlib.md5(raw.encode()).hexdigest())
+    timestamp = None
+    if last_modified is not None:
+        timestamp = int(last_modified.timestamp())
+    response = get_conditional_response(
+        request, etag=etag, last_modified=timestamp)
+    if response is None:
+        response = build()
+    response['ETag'] = etag
+    if timestamp is not None:
+        response['Last-Modified'] = http_date(timestamp)
+    return response
+
+
+def serialize_post(post):
+    group = None
+    if post.group_id:
+        group = {'slug': post.group.slug, 'title': post.group.title}
+    return {
+        'id': post.pk,
+        'text': post.text,
+        'pub_date': post.pub_date.isoformat(),
+        'updated': post.updated.isoformat(),
+        'author': {
+            'username': post.author.username,
+            'full_name': author_name(post.author),
+        },
+        'group': group,
+        'image': post.image.url if post.image else None,
+        'thumbnail': post.thumbnail.url if post.thumbnail else None,
+    }
+
+
+def serialize_comment(comment):
+    return {
+        'id': comment.pk,
+        'text': comment.text,
+        'created': comment.created.isoformat(),
+        'author': {
+            'username': comment.author.username,
+            'full_name': comment.author.get_full_name(),
+        },
+    }
+
+
+def page_links(request, page_obj):
+    """Адреса соседних страниц ленты в той же схеме, что и HTML."""
+    previous_page = next_page = None
+    if not len(page_obj):
+        # Курсоры соседних страниц строятся от записей страницы.
+        return previous_page, next_page
+    if page_obj.has_previous():
+        if page_obj.number:
+            query = f'?page={page_obj.previous_page_number()}'
+        else:
+            query = f'?before={encode_cursor(page_obj[0])}'
+        previous_page = request.build_absolute_uri(query)
+    if page_obj.has_next():
+        query = f'?after={encode_cursor(page_obj[len(page_obj) - 1])}'
+        next_page = request.build_absolute_uri(query)
+    return previous_page, next_page
+
+
+def feed_response(request, queryset, scope):
+    last_modified = queryset.aggregate(Max('pub_date'))['pub_date__max']
+
+    def build():
+        page_obj = paginate(
+            request, queryset.for_feed(), count_scope=scope)
+        previous_page, next_page = page_links(request, page_obj)
+        return render_json({
+            'results': [serialize_post(post) for post in page_obj],
+            'previous': previous_page,
+            'next': next_page,
+        })
+
+    return conditional(request, [scope], last_modified, build)
+
+
+@require_safe
+def index(request):
+    return feed_response(request, Post.objects.all(), ('index',))
+
+
+@require_safe
+def group_posts(request, slug):
+    group = get_object_or_404(Group.objects.only('pk'), slug=slug)
+    return feed_response(request, group.posts.all(), ('group', group.pk))
+
+
+@require_safe
+def profile(request, username):
+    author = get_object_or_404(User.objects.only('pk'), username=username)
+    return feed_response(
+        request, author.posts.all(), ('profile', author.pk))
+
+
+@require_safe
+def post_detail(request, post_id):
+    post = get_object_or_404(Post.objects.for_feed(), pk=post_id)
+    # Название группы и подпись автора меняются без правки поста.
+    scopes = [('post', post.pk), ('profile', post.author_id)]
+    if post.group_id is not None:
+        scopes.append(('group', post.group_id))
+    return conditional(
+        request, scopes, post.updated,
+        lambda: render_json({**serialize_post(post),
+                             'comments_count': post.comments_count}))
+
+
+@require_safe
+def post_comments(request, post_id):
+    """Комментарии поста порциями по курсору ?after= от старых к новым."""
+    post = get_object_or_404(
+        Post.objects.only('pub_date', 'comments_count'), pk=post_id)
+    last_modified = post.comments.aggregate(
+        Max('created'))['created__max']
+
+    def build():
+        comments, cursor = comments_page(
+            post.comments.for_thread(), request.GET.get('after'))
+        next_page = None
+        if cursor is not None:
+            next_page = request.build_absolute_uri(f'?after={cursor}')
+        return render_json({
+            'count': post.comments_count,
+            'results': [serialize_comment(comment) for comment in comments],
+            'next': next_page,
+        })
+
+    return conditional(request, [('post', post.pk)],
+                       last_modified or post.pub_date, build)
@@ -0,0 +1,147 @@
+"""Поколения кэша лент.
+
+Каждая лента (главная, группа, автор, подписки пользователя) имеет
+версию — случайный токен в кэше. Ключи фрагментов лент включают
+версию, поэтому изменение поста делает старые фрагменты недоступными
+сразу, и срок жизни фрагментов можно держать большим. Так же по версии
+лент кэшируются целиком страницы для анонимных посетителей.
+
+HTML карточек постов кэшируется отдельно от лент, по id поста и времени
+его правки: новый пост меняет версию ленты, но карточки остальных
+постов страницы берутся из кэша, и каждая карточка рендерится один раз
+на правку, а не для каждой ленты.
+"""
+import hashlib
+from functools import wraps
+from uuid import uuid4
+
+from core.rendering import author_name
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import patch_cache_control, patch_vary_headers
+
+VERSION_KEY = 'feed_version:{}'
+PAGE_KEY = 'anonymous_page:{}:{}'
+CARD_KEY = 'post_card:{}:{}:{}'
+
+
+def scope_key(*scope):
+    return VERSION_KEY.format(':'.join(str(part) for part in scope))
+
+
+def new_token():
+    return uuid4().hex
+
+
+def feed_version(*scopes):
+    """Общая версия лент scopes; недостающие версии создаются."""
+    keys = [scope_key(*scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, new_token(), None)
+            versions[key] = cache.get(key)
+    return '.'.join(versions[key] for key in keys)
+
+
+def bump(*scopes):
+    """Выдаёт новые версии лентам: их фрагменты больше не читаются.
+
+    Внутри транзакции версии меняются ещё раз после её коммита:
+    читатель, успевший закэшировать под первой новой версией старое
+    содержимое, его больше не увидит. Первая смена нужна самой
+    транзакции — её следующие чтения видят её изменения.
+    """
+    set_new_versions(scopes)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: set_new_versions(scopes))
+
+
+def set_new_versions(scopes):
+    cache.set_many({scope_key(*scope): new_token() for scope in scopes},
+                   None)
+
+
+def post_scopes(post, group_ids=()):
+    """Ленты, в которых показывается пост, и сам пост."""
+    scopes = [('index',), ('profile', post.author_id), ('post', post.pk)]
+    for group_id in {post.group_id, *group_ids}:
+        if group_id is not None:
+            scopes.append(('group', group_id))
+    return scopes
+
+
+def card_key(post):
+    """Ключ карточки поста. Кроме id и времени правки в него входят
+    подписи автора и группы: они меняются без правки поста."""
+    labels = [post.author.username, author_name(post.author)]
+    if post.group_id is not None:
+        labels += [post.group.slug, post.group.title]
+    digest = hashlib.md5('\n'.join(labels).encode()).hexdigest()[:12]
+    return CARD_KEY.format(post.pk, post.updated.timestamp(), digest)
+
+
+def feed_cache_context(*scopes):
+    """Переменные шаблона для {% cache %} фрагмента ленты."""
+    return {
+        'feed_version': feed_version(*scopes),
+        'feed_cache_timeout': settings.FEED_CACHE_TIMEOUT,
+    }
+
+
+def page_key(request, scopes):
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return PAGE_KEY.format(path, feed_version(*scopes))
+
+
+def cacheable(response):
+    # Страница с cookie (например, CSRF) принадлежит одному посетителю.
+    return (response.status_code == 200 and not response.streaming
+            and not response.cookies)
+
+
+def cache_anonymous_page(scopes):
+    """Кэширует страницу ленты целиком для анонимных посетителей.
+
+    scopes(**kwargs) возвращает ленты, которые показывает страница,
+    или None, если её нет (тогда представление ответит само). Ключ
+    кэша — адрес с параметрами и версии лент. Ответ помечается
+    Vary: Cookie: анонимная страница отдаётся прокси как public,
+    страница вошедшего пользователя — как private.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if (request.method not in ('GET', 'HEAD')
+                    or request.user.is_authenticated):
+                response = view(request, *args, **kwargs)
+                patch_cache_control(response, private=True)
+            else:
+                response = anonymous_response(
+                    view, scopes, request, *args, **kwargs)
+            patch_vary_headers(response, ('Cookie',))
+            return response
+        return wrapper
+    return decorator
+
+
+def anonymous_response(view, scopes, request, *args, **kwargs):
+    view_scopes = scopes(*args, **kwargs)
+    if view_scopes is None:
+        return view(request, *args, **kwargs)
+    key = page_key(request, view_scopes)
+    cached = cache.get(key)
+    if cached is not None:
+        content, content_type = cached
+        response = HttpResponse(content, content_type=content_type)
+    else:
+        response = view(request, *args, **kwargs)
+        if not cacheable(response):
+            return response
+        cache.set(key, (response.content, response['Content-Type']),
+                  settings.FEED_CACHE_TIMEOUT)
+    patch_cache_control(
+        response, public=True, max_age=settings.ANONYMOUS_PAGE_MAX_AGE)
+    return response
@@ -0,0 +1,254 @@
+"""Отложенная запись комментариев.
+
+SQLite пускает писать только одного писателя за раз: при потоке
+комментариев к популярному посту вставки ждут друг друга, и часть
+запросов получает «database is locked». С COMMENT_QUEUE_ENABLED
+add_comment не пишет комментарий сам, а ставит его в очередь процесса.
+Фоновый поток собирает очередь в пачки — до COMMENT_QUEUE_BATCH_SIZE
+комментариев и не дольше COMMENT_QUEUE_MAX_DELAY секунд от первого — и
+записывает каждую пачку одной транзакцией через bulk_create.
+
+bulk_create не шлёт post_save, поэтому счётчики, поисковый индекс и
+версии лент пачка обновляет сама, счётчик и версию — по разу на пост.
+
+Если база занята («database is locked»), комментарии возвращаются
+в очередь с растущей паузой от COMMENT_QUEUE_RETRY_DELAY секунд, пока
+не кончатся COMMENT_QUEUE_MAX_ATTEMPTS попыток. Комментарий, который
+база отвергла (например, к удалённому посту), не повторяется.
+
+Пока комментарий ждёт записи, он лежит в кэше под ключом автора и
+поста, и автор видит его на странице поста из любого процесса. Запись
+в кэше снимается после записи пачки или по истечении
+COMMENT_QUEUE_PENDING_TIMEOUT. Перед выходом процесс дописывает очередь.
+"""
+import atexit
+import logging
+import queue
+import threading
+import time
+from collections import Counter
+from uuid import uuid4
+
+from core import metrics
+from django.conf import settings
+from django.core.cache import cache
+from django.db import (DatabaseError, OperationalError, close_old_connections,
+                       transaction)
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import counters, search
+from .cache import bump
+from .models import Comment
+
+PENDING_KEY = 'pending_comments:{}:{}'
+# Сколько секунд процесс при выходе ждёт записи очереди.
+SHUTDOWN_TIMEOUT = 10
+
+logger = logging.getLogger(__name__)
+
+
+def pending_key(author_id, post_id):
+    return PENDING_KEY.format(author_id, post_id)
+
+
+def remember(comment):
+    """Показывает автору комментарий, пока тот ждёт записи."""
+    key = pending_key(comment.author_id, comment.post_id)
+    entries = cache.get(key, [])
+    entries.append({
+        'token': comment._pending_token,
+        'text': comment.text,
+        'created': comment.created.isoformat(),
+    })
+    cache.set(key, entries, settings.COMMENT_QUEUE_PENDING_TIMEOUT)
+
+
+def forget(comments):
+    """Убирает из ожидающих записанные (или потерянные) комментарии."""
+    tokens = {}
+    for comment in comments:
+        key = pending_key(comment.author_id, comment.post_id)
+        tokens.setdefault(key, set()).add(comment._pending_token)
+    # Чтение и запись списка не атомарны: если автор в этот момент
+    # отправит ещё комментарий, один из них будет показан дважды или
+    # не показан, пока запись в кэше не истечёт.
+    for key, written in tokens.items():
+        entries = [entry for entry in cache.get(key, [])
+                   if entry['token'] not in written]
+        if entries:
+            cache.set(key, entries, settings.COMMENT_QUEUE_PENDING_TIMEOUT)
+        else:
+            cache.delete(key)
+
+
+def pending_comments(user, post):
+    """Ещё не записанные комментарии пользователя к посту."""
+    if not settings.COMMENT_QUEUE_ENABLED or not user.is_authenticated:
+        return []
+    return [
+        Comment(post=post, author=user, text=entry['text'],
+                created=parse_datetime(entry['created']))
+        for entry in cache.get(pending_key(user.pk, post.pk), [])
+    ]
+
+
+def insert(comments):
+    """Вставляет пачку и обновляет то, что обновили бы сигналы."""
+    Comment.objects.bulk_create(comments)
+    if comments[0].pk is None:
+        # SQLite не возвращает id из bulk_create. Пока транзакция
+        # держит блокировку записи, строки получают id подряд
+        # в порядке вставки.
+        last_pk = Comment.objects.order_by('-pk').values_list(
+            'pk', flat=True)[0]
+        first_pk = last_pk - len(comments) + 1
+        for pk, comment in enumerate(comments, first_pk):
+            comment.pk = pk
+    posts = Counter(comment.post_id for comment in comments)
+    for post_id, added in posts.items():
+        counters.change_comments_count(post_id, added)
+    for comment in comments:
+        search.index_comment(comment)
+    transaction.on_commit(
+        lambda: bump(*[('post', post_id) for post_id in posts]))
+
+
+def save_each(comments):
+    """Записывает комментарии по одному, чтобы комментарий к удалённому
+    посту не утянул за собой остальные; возвращает те, что не записаны
+    из-за занятой базы."""
+    retry = []
+    for comment in comments:
+        comment.pk = None
+        try:
+            comment.save()
+        except OperationalError:
+            retry.append(comment)
+        except DatabaseError:
+            logger.exception(
+                'Комментарий к посту %s не записан', comment.post_id)
+    return retry
+
+
+def write(comments):
+    """Записывает пачку одной транзакцией, а если не вышло — по одному.
+    Возвращает комментарии, запись которых стоит повторить позже."""
+    try:
+        with transaction.atomic():
+            insert(comments)
+    except OperationalError:
+        # База занята: по одному запись упрётся в ту же блокировку.
+        logger.warning(
+            'База занята, пачка из %s комментариев будет повторена',
+            len(comments))
+        for comment in comments:
+            comment.pk = None
+        retry = comments
+    except DatabaseError:
+        logger.exception(
+            'Не удалось записать пачку из %s комментариев', len(comments))
+        retry = save_each(comments)
+    else:
+        retry = []
+    metrics.incr('comment_batches')
+    retried = {id(comment) for comment in retry}
+    forget([comment for comment in comments if id(comment) not in retried])
+    return retry
+
+
+class CommentQueue:
+    """Очередь комментариев процесса с фоновым потоком записи."""
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, comment):
+        comment._pending_token = uuid4().hex
+        comment._attempts = 0
+        comment.created = timezone.now()
+        remember(comment)
+        metrics.incr('comments_queued')
+        self._queue.put(comment)
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name='comment-queue', daemon=True)
+                self._thread.start()
+
+    def next_batch(self):
+        """Ждёт первый комментарий и добирает к нему пачку."""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + settings.COMMENT_QUEUE_MAX_DELAY
+        while len(batch) < settings.COMMENT_QUEUE_BATCH_SIZE:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self.next_batch()
+            retry = []
+            try:
+                retry = write(batch)
+            except Exception:
+                logger.exception('Очередь комментариев: ошибка записи')
+            finally:
+                close_old_connections()
+                for _ in range(len(batch) - len(retry)):
+                    self._queue.task_done()
+            for comment in retry:
+                self.retry(comment)
+
+    def retry(self, comment):
+        """Возвращает комментарий в очередь после паузы. Пока он ждёт,
+        его прежняя постановка не закрыта, и join() его дожидается."""
+        comment._attempts += 1
+        if comment._attempts >= settings.COMMENT_QUEUE_MAX_ATTEMPTS:
+            logger.error(
+                'Комментарий к посту %s не записан за %s попыток',
+                comment.post_id, comment._attempts)
+            forget([comment])
+            self._queue.task_done()
+            return
+        metrics.incr('comment_retries')
+        delay = settings.COMMENT_QUEUE_RETRY_DELAY * 2 ** (
+            comment._attempts - 1)
+        timer = threading.Timer(delay, self.requeue, [comment])
+        timer.daemon = True
+        timer.start()
+
+    def requeue(self, comment):
+        self._queue.put(comment)
+        self._queue.task_done()
+
+    def join(self, timeout=None):
+        """Ждёт записи всех поставленных комментариев; False, если
+        не дождался за timeout секунд."""
+        with self._queue.all_tasks_done:
+            return self._queue.all_tasks_done.wait_for(
+                lambda: not self._queue.unfinished_tasks, timeout)
+
+
+comment_queue = CommentQueue()
+
+
+@atexit.register
+def flush_on_exit():
+    if comment_queue._thread is not None:
+        comment_queue.join(SHUTDOWN_TIMEOUT)
+
+
+def save(comment):
+    """Записывает комментарий сразу или ставит его в очередь."""
+    if settings.COMMENT_QUEUE_ENABLED:
+        comment_queue.submit(comment)
+    else:
+        comment.save()
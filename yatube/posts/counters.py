@@ -0,0 +1,103 @@
+"""Денормализованные счётчики постов, комментариев, подписчиков
+и ссылок на файлы картинок.
+
+Счётчики меняются атомарно через F()-выражения; если они разошлись
+с данными, их пересчитывает команда manage.py recount.
+"""
+from core.rendering import display_name
+from django.db.models import Count, F
+
+from users.models import Profile
+
+from .models import Comment, Follow, ImageBlob, Post, User
+
+
+def shift(queryset, field, delta):
+    """Сдвигает счётчик в БД, не опуская его ниже нуля."""
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    queryset.update(**{field: F(field) + delta})
+
+
+def change_posts_count(author_id, delta):
+    shift(Profile.objects.filter(user_id=author_id), 'posts_count', delta)
+
+
+def change_followers_count(author_id, delta):
+    shift(Profile.objects.filter(user_id=author_id),
+          'followers_count', delta)
+
+
+def change_comments_count(post_id, delta):
+    shift(Post.objects.filter(pk=post_id), 'comments_count', delta)
+
+
+def change_image_references(name, delta):
+    shift(ImageBlob.objects.filter(name=name), 'references', delta)
+
+
+def batches(queryset, batch_size):
+    """Первичные ключи queryset пачками по batch_size."""
+    pks = queryset.order_by('pk').values_list('pk', flat=True)
+    last_pk = None
+    while True:
+        page = pks if last_pk is None else pks.filter(pk__gt=last_pk)
+        batch = list(page[:batch_size])
+        if not batch:
+            return
+        yield batch
+        last_pk = batch[-1]
+
+
+def counts(model, field, ids):
+    return dict(
+        model.objects.filter(**{f'{field}__in': ids})
+        .values_list(field).annotate(n=Count('pk')).order_by()
+    )
+
+
+def recount_profiles(batch_size):
+    """Пересчитывает счётчики и подписи пользователей; возвращает число
+    профилей."""
+    total = 0
+    for ids in batches(User.objects.all(), batch_size):
+        Profile.objects.bulk_create(
+            [Profile(user_id=pk) for pk in ids], ignore_conflicts=True)
+        posts = counts(Post, 'author', ids)
+        followers = counts(Follow, 'author', ids)
+        profiles = list(Profile.objects.select_related('user').only(
+            'user__first_name', 'user__last_name').filter(user_id__in=ids))
+        for profile in profiles:
+            profile.posts_count = posts.get(profile.user_id, 0)
+            profile.followers_count = followers.get(profile.user_id, 0)
+            profile.display_name = display_name(profile.user)
+        Profile.objects.bulk_update(
+            profiles, ['posts_count', 'followers_count', 'display_name'])
+        total += len(profiles)
+    return total
+
+
+def recount_posts(batch_size):
+    """Пересчитывает счётчики комментариев; возвращает число постов."""
+    total = 0
+    for ids in batches(Post.objects.all(), batch_size):
+        comments = counts(Comment, 'post', ids)
+        posts = [Post(pk=pk, comments_count=comments.get(pk, 0))
+                 for pk in ids]
+        Post.objects.bulk_update(posts, ['comments_count'])
+        total += len(posts)
+    return total
+
+
+def recount_images(batch_size):
+    """Пересчитывает ссылки на файлы картинок; возвращает число файлов."""
+    total = 0
+    for ids in batches(ImageBlob.objects.all(), batch_size):
+        blobs = list(ImageBlob.objects.filter(pk__in=ids))
+        references = counts(
+            Post, 'image', [blob.name for blob in blobs])
+        for blob in blobs:
+            blob.references = references.get(blob.name, 0)
+        ImageBlob.objects.bulk_update(blobs, ['references'])
+        total += len(blobs)
+    return total
@@ -0,0 +1,118 @@
+"""Число постов в лентах для номерных страниц.
+
+Числа хранятся в кэше под областями лент, как версии в posts.cache:
+('index',), ('group', id), ('profile', id) и ('follow', id). Создание
+и удаление поста сдвигают числа его лент через cache.incr без COUNT(*).
+Отсутствующее число считается заново: для автора это счётчик профиля
+(COUNT(*), если профиля нет), для подписок — сумма счётчиков авторов,
+на которых подписан пользователь, для главной и групп — COUNT(*).
+
+Числа могут разойтись с базой: bulk_create не шлёт сигналов, инкремент
+может разминуться с пересчётом, а ленты подписок не сдвигаются при
+новых постах авторов. Поэтому раз в FEED_COUNT_RECONCILE_INTERVAL
+секунд первое чтение ленты пересчитывает её, а manage.py recount
+сверяет все ленты сразу.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Sum
+
+from users.models import Profile
+
+from .counters import batches, counts
+from .models import Group, Post, User
+
+KEY = 'feed_count:{}'
+CHECKED_KEY = 'feed_count_checked:{}'
+
+
+def count_key(scope):
+    return KEY.format(':'.join(str(part) for part in scope))
+
+
+def checked_key(scope):
+    return CHECKED_KEY.format(':'.join(str(part) for part in scope))
+
+
+def profile_count(author_id):
+    count = Profile.objects.filter(user_id=author_id).values_list(
+        'posts_count', flat=True).first()
+    if count is None:
+        # Профиля нет: пользователь создан без сигналов.
+        return Post.objects.filter(author_id=author_id).count()
+    return count
+
+
+def follow_count(user_id):
+    authors = Profile.objects.filter(user__following__user_id=user_id)
+    return authors.aggregate(total=Sum('posts_count'))['total'] or 0
+
+
+EXACT = {
+    'index': lambda: Post.objects.count(),
+    'group': lambda group_id: Post.objects.filter(group_id=group_id).count(),
+    'profile': profile_count,
+    'follow': follow_count,
+}
+
+
+def exact(scope):
+    """Число постов ленты по базе."""
+    kind, *args = scope
+    return EXACT[kind](*args)
+
+
+def store(scope, count):
+    cache.set(count_key(scope), count, None)
+    return count
+
+
+def get(scope):
+    """Число постов ленты: из кэша или, если пора сверить, по базе."""
+    key, checked = count_key(scope), checked_key(scope)
+    values = cache.get_many([key, checked])
+    if key in values and checked in values:
+        return values[key]
+    # Числа нет или пора сверить его с базой; сверяет один запрос.
+    due = cache.add(checked, True, settings.FEED_COUNT_RECONCILE_INTERVAL)
+    if due or key not in values:
+        return store(scope, exact(scope))
+    return values[key]
+
+
+def change(scopes, delta):
+    """Сдвигает числа лент, которые уже есть в кэше."""
+    for scope in scopes:
+        try:
+            cache.incr(count_key(scope), delta)
+        except ValueError:
+            # Числа нет: его посчитает первое чтение ленты.
+            pass
+
+
+def forget(scope):
+    cache.delete(count_key(scope))
+
+
+def post_scopes(post):
+    """Ленты с числом постов, в которых показывается пост."""
+    scopes = [('index',), ('profile', post.author_id)]
+    if post.group_id is not None:
+        scopes.append(('group', post.group_id))
+    return scopes
+
+
+def reconcile_all(batch_size):
+    """Сверяет числа всех лент с базой; счётчики профилей уже должны
+    быть пересчитаны."""
+    store(('index',), Post.objects.count())
+    for ids in batches(Group.objects.all(), batch_size):
+        posts = counts(Post, 'group', ids)
+        cache.set_many({count_key(('group', pk)): posts.get(pk, 0)
+                        for pk in ids}, None)
+    for ids in batches(User.objects.all(), batch_size):
+        profiles = dict(Profile.objects.filter(
+            user_id__in=ids).values_list('user_id', 'posts_count'))
+        cache.set_many({count_key(('profile', pk)): profiles.get(pk, 0)
+                        for pk in ids}, None)
+        cache.delete_many([count_key(('follow', pk)) for pk in ids])
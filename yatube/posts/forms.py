@@ -17,6 +17,33 @@ class PostForm(forms.ModelForm):
             'text': _('Writer'),
         }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Файлы, отклонённые ImageUploadHandler ещё при приёмке,
+        # не доходят до поля: вместо них форма показывает причину.
+        self.upload_errors = {}
+        if any(hasattr(upload, 'upload_error')
+               for upload in self.files.values()):
+            self.files = self.files.copy()
+            for name, upload in list(self.files.items()):
+                if hasattr(upload, 'upload_error'):
+                    self.upload_errors[name] = upload.upload_error
+                    del self.files[name]
+
+    def clean_image(self):
+        if 'image' in self.upload_errors:
+            raise forms.ValidationError(self.upload_errors['image'])
+        return self.cleaned_data['image']
+
+    def save(self, commit=True):
+        if 'image' in self.changed_data:
+            # Миниатюры старой картинки больше не подходят.
+            self.instance.thumbnail = ''
+            self.instance.image_variants = ''
+            self.instance.image_width = None
+            self.instance.image_height = None
+        return super().save(commit)
+
 
 class CommentForm(forms.ModelForm):
 
@@ -0,0 +1,35 @@
+"""Адреса страниц автора, группы и поста для карточек лент.
+
+reverse() перебирает шаблоны URL при каждом вызове, а карточка поста
+зовёт его до трёх раз. Адрес зависит только от аргумента и префикса
+скрипта, поэтому результаты запоминаются; кэш сбрасывается при смене
+ROOT_URLCONF в тестах.
+"""
+from functools import lru_cache
+
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.urls import get_script_prefix, reverse
+
+
+@lru_cache(maxsize=10000)
+def cached_reverse(prefix, name, arg):
+    return reverse(name, args=[arg])
+
+
+def profile_url(username):
+    return cached_reverse(get_script_prefix(), 'posts:profile', username)
+
+
+def group_url(slug):
+    return cached_reverse(get_script_prefix(), 'posts:group_list', slug)
+
+
+def post_url(post_id):
+    return cached_reverse(get_script_prefix(), 'posts:post_detail', post_id)
+
+
+@receiver(setting_changed)
+def clear_on_urlconf_change(setting, **kwargs):
+    if setting == 'ROOT_URLCONF':
+        cached_reverse.cache_clear()
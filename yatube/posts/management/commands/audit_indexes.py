@@ -0,0 +1,94 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from posts import timeline
+from posts.models import Comment, Post, User
+from posts.paginators import (COMMENTS_PER_PAGE, POSTS_PER_PAGE,
+                              KeysetPaginator, comments_after, encode_cursor)
+
+# Признаки плана, при которых запрос ленты читает таблицу целиком
+# или сортирует результат во временном B-дереве.
+FULL_SCAN = 'SCAN'
+TEMP_SORT = 'USE TEMP B-TREE'
+# Запросы, которым сортировка нужна по устройству, — о них только
+# предупреждаем. Лента с популярными авторами объединяет через OR записи
+# ленты и посты авторов: SQLite не сливает два упорядоченных индекса,
+# поэтому сортирует посты этой ленты (не всю таблицу).
+EXPECTED_SORTS = ('posts:follow_index hot', 'posts:follow_index hot ?after=')
+
+
+def feed_queries():
+    """Запросы, которые выполняют представления posts при показе лент.
+
+    Значения параметров не важны: план зависит только от формы запроса.
+    """
+    now = timezone.now()
+    position = (now, 1)
+    user = User(pk=1)
+    feeds = {
+        'posts:index': (Post.objects.all(), None),
+        'posts:group_list': (Post.objects.filter(group_id=1), None),
+        'posts:profile': (Post.objects.filter(author_id=1), None),
+        'posts:follow_index': (
+            timeline.follow_feed(user, hot_ids=[]), timeline.FEED_KEY),
+        'posts:follow_index hot': (
+            timeline.follow_feed(user, hot_ids=[1, 2]), timeline.FEED_KEY),
+    }
+    queries = {}
+    for name, (queryset, key) in feeds.items():
+        paginator = KeysetPaginator(queryset.for_feed(), key=key)
+        queryset = paginator.object_list
+        queries[name] = queryset[:POSTS_PER_PAGE]
+        queries[f'{name} ?after='] = queryset.filter(
+            paginator.cursor_filter(position, 'lte', 'gte')
+        )[:POSTS_PER_PAGE + 1]
+    comments = Post(pk=1).comments.for_thread()
+    cursor = encode_cursor(Comment(pk=1, created=now), 'created')
+    for name, after in (('posts:post_detail comments', None),
+                        ('posts:post_detail comments ?after=', cursor)):
+        queries[name] = comments_after(
+            comments, after)[:COMMENTS_PER_PAGE + 1]
+    return queries
+
+
+def explain(queryset):
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def problems(plan):
+    """Шаги плана с полным просмотром таблицы или сортировкой."""
+    return [
+        step for step in plan
+        if TEMP_SORT in step
+        or (step.startswith(FULL_SCAN) and ' USING ' not in step)
+    ]
+
+
+class Command(BaseCommand):
+    help = ('Проверяет через EXPLAIN QUERY PLAN, что запросы лент '
+            'читают посты по индексу без полного просмотра и сортировки.')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('audit_indexes работает только с SQLite.')
+        failed = []
+        for name, queryset in feed_queries().items():
+            plan = explain(queryset)
+            bad_steps = problems(plan)
+            if not bad_steps:
+                style = self.style.SUCCESS
+            elif name in EXPECTED_SORTS:
+                style = self.style.WARNING
+            else:
+                style = self.style.ERROR
+                failed.append(name)
+            self.stdout.write(style(name))
+            for step in plan:
+                self.stdout.write(f'    {step}')
+        if failed:
+            raise CommandError(
+                'Запросы без подходящего индекса: ' + ', '.join(failed))
@@ -0,0 +1,165 @@
+import json
+import math
+import platform
+import time
+import tracemalloc
+
+import django
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import urlencode
+
+from posts.models import Comment, Follow, Group, Post, User
+from posts.paginators import POSTS_PER_PAGE, encode_cursor
+
+# Глубина ленты, с которой начинается страница по курсору.
+DEEP_PAGE_OFFSET = POSTS_PER_PAGE * 100
+
+
+def percentile(values, percent):
+    """Перцентиль по методу ближайшего ранга."""
+    ordered = sorted(values)
+    rank = max(math.ceil(percent / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def measure(client, url, requests, warmup, cold):
+    """Время ответа, число запросов к БД и пик памяти для url."""
+    for _ in range(warmup):
+        client.get(url)
+    timings = []
+    queries = []
+    for _ in range(requests):
+        if cold:
+            cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            start = time.perf_counter()
+            response = client.get(url)
+            timings.append((time.perf_counter() - start) * 1000)
+        queries.append(len(context))
+    # tracemalloc замедляет код, поэтому память меряется отдельно.
+    if cold:
+        cache.clear()
+    tracemalloc.start()
+    try:
+        client.get(url)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        'url': url,
+        'status': response.status_code,
+        'p50_ms': round(percentile(timings, 50), 2),
+        'p95_ms': round(percentile(timings, 95), 2),
+        'mean_ms': round(sum(timings) / len(timings), 2),
+        'max_ms': round(max(timings), 2),
+        'queries': percentile(queries, 50),
+        'max_queries': max(queries),
+        'peak_memory_kb': peak // 1024,
+    }
+
+
+def compare(report, baseline):
+    """Строки сравнения отчёта с прошлым: p50, p95 и запросы."""
+    lines = []
+    for name, current in report['views'].items():
+        previous = baseline.get('views', {}).get(name)
+        if previous is None:
+            lines.append(f'{name}: нет в прошлом отчёте')
+            continue
+        changes = []
+        for metric in ('p50_ms', 'p95_ms', 'queries', 'peak_memory_kb'):
+            old, new = previous[metric], current[metric]
+            delta = f'{(new - old) / old:+.0%}' if old else 'n/a'
+            changes.append(f'{metric} {old} → {new} ({delta})')
+        lines.append(f'{name}: ' + ', '.join(changes))
+    return lines
+
+
+class Command(BaseCommand):
+    help = ('Замеряет представления ленты через тестовый клиент и пишет '
+            'p50/p95 времени ответа, число запросов к БД и пик памяти '
+            'в JSON-отчёт. Данные готовит manage.py seed_bench.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument('--output', default='bench-report.json')
+        parser.add_argument('--baseline',
+                            help='Прошлый отчёт для сравнения.')
+        parser.add_argument('--cold', action='store_true',
+                            help='Очищать кэш перед каждым запросом.')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1:
+            raise CommandError('--requests должно быть больше нуля.')
+        if not Post.objects.exists():
+            raise CommandError('В базе нет постов: запустите seed_bench.')
+        report = {'meta': self.meta(options), 'views': {}}
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            for name, (client, url) in self.targets().items():
+                self.stdout.write(f'{name}: {url}')
+                report['views'][name] = measure(
+                    client, url, options['requests'], options['warmup'],
+                    options['cold'])
+        with open(options['output'], 'w', encoding='utf-8') as output:
+            json.dump(report, output, ensure_ascii=False, indent=2)
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as baseline:
+                for line in compare(report, json.load(baseline)):
+                    self.stdout.write(line)
+        self.stdout.write(self.style.SUCCESS(
+            f'Отчёт записан в {options["output"]}'))
+
+    def meta(self, options):
+        return {
+            'created': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'requests': options['requests'],
+            'cold': options['cold'],
+            'rows': {model.__name__: model.objects.count()
+                     for model in (User, Group, Post, Comment, Follow)},
+        }
+
+    def targets(self):
+        """Представления и адреса для замера на самых тяжёлых данных."""
+        anonymous = Client()
+        author = User.objects.order_by('-profile__posts_count').first()
+        reader_id = (
+            Follow.objects.values('user').annotate(n=Count('pk'))
+            .order_by('-n').values_list('user', flat=True).first()
+        )
+        reader = User.objects.get(pk=reader_id or author.pk)
+        authorized = Client()
+        authorized.force_login(reader)
+        post = Post.objects.order_by('-comments_count', '-pk').first()
+        deep_posts = list(Post.objects.order_by('-pub_date', '-pk')
+                          [DEEP_PAGE_OFFSET:DEEP_PAGE_OFFSET + 1])
+        deep_post = deep_posts[0] if deep_posts else post
+        query = urlencode({'q': post.text.split()[0] if post.text else ''})
+        targets = {
+            'index': (anonymous, reverse('posts:index')),
+            'index_authorized': (authorized, reverse('posts:index')),
+            'index_deep': (
+                anonymous,
+                reverse('posts:index') + f'?after={encode_cursor(deep_post)}'),
+            'profile': (anonymous, reverse('posts:profile', args=[author])),
+            'post_detail': (
+                anonymous, reverse('posts:post_detail', args=[post.pk])),
+            'follow_index': (authorized, reverse('posts:follow_index')),
+            'search': (anonymous, reverse('posts:search') + f'?{query}'),
+            'api_index': (anonymous, reverse('posts:api_index')),
+        }
+        group = Group.objects.annotate(n=Count('posts')).order_by('-n').first()
+        if group is not None:
+            targets['group_list'] = (
+                anonymous, reverse('posts:group_list', args=[group.slug]))
+        return targets
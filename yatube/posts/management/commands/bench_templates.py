@@ -0,0 +1,185 @@
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.template import Context, Engine
+from django.template.backends.django import get_installed_libraries
+from django.utils import timezone
+
+from posts.cache import card_key
+from posts.models import Group, Post, User
+from users.models import Profile
+
+from .bench import percentile
+
+INCLUDE_FEED = (
+    '{% for post in posts %}'
+    "{% include 'posts/includes/post_list.html' %}"
+    '{% if not forloop.last %}<hr>{% endif %}'
+    '{% endfor %}'
+)
+CARDS_FEED = (
+    '{% load post_filters %}'
+    '{% post_cards posts as cards %}'
+    '{% for card in cards %}'
+    '{{ card }}{% if not forloop.last %}<hr>{% endif %}'
+    '{% endfor %}'
+)
+# Карточка поста в прежнем виде: адреса через {% url %}.
+LEGACY_CARD = '''{% load post_filters %}
+<article>
+  <ul>
+    <li>
+      Автор: {{ post.author.get_full_name }}
+      <a href="{% url 'posts:profile' post.author %}">
+        все посты пользователя</a>
+    </li>
+    {% if post.group %}
+      <li>
+        Группа: {{ post.group.title }}
+        <a href={% url 'posts:group_list' post.group.slug %}>
+          все записи группы</a><br>
+      </li>
+    {% endif %}
+    <li>
+      Дата публикации: {{ post.pub_date|date:"d E Y" }}
+    </li>
+  </ul>
+  {% if post.image %}
+    {% post_image post %}
+  {% endif %}
+  <p>{{ post.text }}</p>
+  <a href="{% url 'posts:post_detail' post.pk %}">подробная информация </a>
+</article>'''
+# Карточка до core.rendering: адреса запомнены, но дата форматируется
+# и подпись автора собирается для каждого поста.
+URLS_CARD = '''{% load post_filters %}
+<article>
+  <ul>
+    <li>
+      Автор: {{ post.author.get_full_name }}
+      <a href="{{ post.author.username|profile_url }}">
+        все посты пользователя</a>
+    </li>
+    {% if post.group %}
+      <li>
+        Группа: {{ post.group.title }}
+        <a href="{{ post.group.slug|group_url }}">все записи группы</a><br>
+      </li>
+    {% endif %}
+    <li>
+      Дата публикации: {{ post.pub_date|date:"d E Y" }}
+    </li>
+  </ul>
+  {% if post.image %}
+    {% post_image post %}
+  {% endif %}
+  <p>{{ post.text }}</p>
+  <a href="{{ post.pk|post_url }}">подробная информация </a>
+</article>'''
+FILE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
+
+def engine(templates, cached):
+    loaders = [('django.template.loaders.locmem.Loader', templates),
+               *FILE_LOADERS]
+    if cached:
+        loaders = [('django.template.loaders.cached.Loader', loaders)]
+    return Engine(dirs=[settings.TEMPLATES_DIR], loaders=loaders,
+                  libraries=get_installed_libraries())
+
+
+def variants():
+    """Способы рендеринга ленты: движок, имя шаблона страницы и нужно ли
+    убирать карточки из кэша перед каждым рендерингом."""
+    feeds = {'include.html': INCLUDE_FEED, 'cards.html': CARDS_FEED}
+    legacy = {**feeds, 'posts/includes/post_list.html': LEGACY_CARD}
+    urls = {**feeds, 'posts/includes/post_list.html': URLS_CARD}
+    cached = engine(feeds, cached=True)
+    return {
+        # Как до кэширования шаблонов: файлы читаются и компилируются
+        # при каждом рендеринге, адреса — через reverse().
+        'legacy': (engine(legacy, cached=False), 'include.html', False),
+        'cached_loader': (engine(legacy, cached=True), 'include.html',
+                          False),
+        'memoized_urls': (engine(urls, cached=True), 'include.html',
+                          False),
+        'rendering_helpers': (cached, 'include.html', False),
+        'post_cards': (cached, 'cards.html', True),
+        'card_cache': (cached, 'cards.html', False),
+    }
+
+
+def sample_posts(count):
+    """Посты в памяти: замеряется только рендеринг, без запросов к БД."""
+    now = timezone.now()
+    group = Group(pk=1, title='Группа', slug='bench-group')
+    posts = []
+    for pk in range(1, count + 1):
+        author = User(pk=pk, username=f'bench_author_{pk}',
+                      first_name='Имя', last_name='Фамилия')
+        Profile(user=author, display_name=author.get_full_name())
+        posts.append(Post(
+            pk=pk, author=author, group=group if pk % 2 else None,
+            text='Текст поста для замера рендеринга. ' * 5,
+            pub_date=now, updated=now))
+    return posts
+
+
+def measure(template_engine, name, posts, iterations, warmup,
+            render_cards):
+    keys = [card_key(post) for post in posts]
+    for _ in range(warmup):
+        template_engine.get_template(name).render(Context({'posts': posts}))
+    timings = []
+    for _ in range(iterations):
+        if render_cards:
+            cache.delete_many(keys)
+        start = time.perf_counter()
+        template_engine.get_template(name).render(Context({'posts': posts}))
+        timings.append((time.perf_counter() - start) * 1000)
+    mean = sum(timings) / len(timings)
+    return {
+        'p50_ms': round(percentile(timings, 50), 3),
+        'p95_ms': round(percentile(timings, 95), 3),
+        'mean_ms': round(mean, 3),
+        # Время на одну карточку ленты.
+        'per_post_us': round(mean * 1000 / max(len(posts), 1), 1),
+    }
+
+
+class Command(BaseCommand):
+    help = ('Замеряет рендеринг ленты из --posts постов: прежний способ '
+            'без кэша шаблонов, с кэшем шаблонов, с запомненными '
+            'адресами, с core.rendering, через post_cards и с карточками '
+            'из кэша.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=10)
+        parser.add_argument('--iterations', type=int, default=500)
+        parser.add_argument('--warmup', type=int, default=20)
+        parser.add_argument('--output', help='JSON-файл для отчёта.')
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError('--iterations должно быть больше нуля.')
+        posts = sample_posts(options['posts'])
+        report = {}
+        for variant, (template_engine, name, render_cards) in (
+                variants().items()):
+            report[variant] = result = measure(
+                template_engine, name, posts, options['iterations'],
+                options['warmup'], render_cards)
+            self.stdout.write(
+                f'{variant}: p50 {result["p50_ms"]} мс, '
+                f'p95 {result["p95_ms"]} мс, '
+                f'среднее {result["mean_ms"]} мс, '
+                f'на пост {result["per_post_us"]} мкс')
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                json.dump(report, output, indent=2)
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from posts import counters, feed_counts
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает счётчики постов, подписчиков, комментариев '
+            'и ссылок на картинки и числа постов в лентах пачками '
+            'по --batch-size записей.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        profiles = counters.recount_profiles(batch_size)
+        posts = counters.recount_posts(batch_size)
+        images = counters.recount_images(batch_size)
+        feed_counts.reconcile_all(batch_size)
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано профилей: {profiles}, постов: {posts}, '
+            f'картинок: {images}'))
@@ -0,0 +1,190 @@
+import itertools
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from posts import counters, feed_counts, search, timeline
+from posts.models import Comment, Follow, Group, Post, User
+
+USERNAME = 'bench_user_{}'
+WORDS = (
+    'кот собака море горы лес город река утро вечер дождь солнце книга '
+    'фильм музыка кофе чай поезд дорога дом окно снег ветер песня друг '
+    'работа отпуск праздник сад цветы небо звёзды облако тишина улица '
+    'день ночь зима лето весна осень мост парк вокзал письмо история'
+).split()
+# Показатель степенного распределения: на кого подписываются и какие
+# слова встречаются в текстах.
+ALPHA = 1.2
+
+
+def zipf_weights(n):
+    return list(itertools.accumulate(
+        1 / rank ** ALPHA for rank in range(1, n + 1)))
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+@contextmanager
+def explicit_dates(*fields):
+    """Позволяет задать поля auto_now_add при bulk_create."""
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+class Command(BaseCommand):
+    help = ('Заполняет базу синтетическими пользователями, группами, '
+            'постами, комментариями и подписками для нагрузочных '
+            'замеров (manage.py bench).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument('--comments', type=int, default=200000)
+        parser.add_argument('--follows-per-user', type=int, default=20)
+        parser.add_argument('--days', type=int, default=365,
+                            help='За сколько дней разбросаны даты постов.')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--skip-search-index', action='store_true')
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.now = timezone.now()
+        self.period = timedelta(days=options['days'])
+        self.word_weights = zipf_weights(len(WORDS))
+
+        user_ids = self.create_users(options['users'])
+        group_ids = self.create_groups(options['groups'])
+        # Авторы упорядочены по популярности: первые получают
+        # больше всего подписчиков и пишут больше всего постов.
+        self.random.shuffle(user_ids)
+        author_weights = zipf_weights(len(user_ids))
+        with explicit_dates(Post._meta.get_field('pub_date'),
+                            Comment._meta.get_field('created')):
+            post_ids = self.create_posts(
+                options['posts'], user_ids, author_weights, group_ids)
+            self.create_comments(options['comments'], user_ids, post_ids)
+        self.create_follows(
+            options['follows_per_user'], user_ids, author_weights)
+
+        self.log('Пересчёт счётчиков')
+        counters.recount_profiles(self.batch_size)
+        counters.recount_posts(self.batch_size)
+        feed_counts.reconcile_all(self.batch_size)
+        self.log('Заполнение лент подписок')
+        timeline.fill_timelines()
+        if not options['skip_search_index']:
+            self.log('Построение поискового индекса')
+            search.rebuild(self.batch_size)
+        self.stdout.write(self.style.SUCCESS('Готово'))
+
+    def log(self, message):
+        self.stdout.write(message)
+
+    def bulk_create(self, model, objects):
+        """Сохраняет объекты пачками; возвращает число записей."""
+        total = 0
+        for batch in batched(objects, self.batch_size):
+            with transaction.atomic():
+                model.objects.bulk_create(batch, ignore_conflicts=True)
+            total += len(batch)
+        return total
+
+    def new_ids(self, queryset, start_pk):
+        return list(queryset.filter(pk__gt=start_pk).order_by('pk')
+                    .values_list('pk', flat=True))
+
+    def last_pk(self, model):
+        return model.objects.order_by('-pk').values_list(
+            'pk', flat=True).first() or 0
+
+    def create_users(self, count):
+        self.log(f'Пользователи: {count}')
+        start = self.last_pk(User)
+        self.bulk_create(User, (
+            User(username=USERNAME.format(start + i), password='!',
+                 first_name=self.random.choice(WORDS).title())
+            for i in range(count)
+        ))
+        return self.new_ids(User.objects, start)
+
+    def create_groups(self, count):
+        self.log(f'Группы: {count}')
+        start = self.last_pk(Group)
+        self.bulk_create(Group, (
+            Group(title=f'Группа {start + i}', slug=f'bench-{start + i}',
+                  description=self.text(10))
+            for i in range(count)
+        ))
+        return self.new_ids(Group.objects, start)
+
+    def text(self, words):
+        return ' '.join(self.random.choices(
+            WORDS, cum_weights=self.word_weights, k=words)).capitalize()
+
+    def date(self):
+        return self.now - self.period * self.random.random()
+
+    def create_posts(self, count, user_ids, author_weights, group_ids):
+        self.log(f'Посты: {count}')
+        start = self.last_pk(Post)
+        self.bulk_create(Post, (
+            Post(
+                author_id=self.random.choices(
+                    user_ids, cum_weights=author_weights)[0],
+                group_id=(self.random.choice(group_ids)
+                          if group_ids and self.random.random() < 0.5
+                          else None),
+                text=self.text(self.random.randint(5, 60)),
+                pub_date=self.date(),
+            )
+            for _ in range(count)
+        ))
+        return self.new_ids(Post.objects, start)
+
+    def create_comments(self, count, user_ids, post_ids):
+        self.log(f'Комментарии: {count}')
+        if not post_ids:
+            return
+        self.bulk_create(Comment, (
+            Comment(
+                post_id=self.random.choice(post_ids),
+                author_id=self.random.choice(user_ids),
+                text=self.text(self.random.randint(3, 20)),
+                created=self.date(),
+            )
+            for _ in range(count)
+        ))
+
+    def create_follows(self, per_user, user_ids, author_weights):
+        """Подписки со степенным распределением популярности авторов."""
+        self.log(f'Подписки: до {per_user} на пользователя')
+
+        def follows():
+            for user_id in user_ids:
+                authors = set(self.random.choices(
+                    user_ids, cum_weights=author_weights, k=per_user))
+                authors.discard(user_id)
+                for author_id in authors:
+                    yield Follow(user_id=user_id, author_id=author_id)
+
+        self.bulk_create(Follow, follows())
@@ -0,0 +1,88 @@
+# Generated by Django 2.2.16 on 2026-10-18 18:43
+
+from collections import Counter
+from itertools import chain
+
+from django.conf import settings
+from django.db import OperationalError, migrations, models
+import django.db.models.deletion
+
+FTS_TABLE = 'posts_search_fts'
+
+
+def create_fts_table(apps, schema_editor):
+    # Таблица FTS5 нужна только SQLite и только сборке с FTS5; без неё
+    # posts.search работает через обратный индекс SearchTerm.
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    try:
+        schema_editor.execute(
+            f'CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5('
+            f'post_text, comment_text, post_id UNINDEXED, '
+            f"tokenize = 'unicode61 remove_diacritics 0')"
+        )
+    except OperationalError:
+        pass
+
+
+def drop_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+def fill_search_index(apps, schema_editor):
+    # Уже написанные посты и комментарии попадают в тот индекс,
+    # который выберет posts.search.
+    from posts.search import FTS5Backend, tokenize
+
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    SearchTerm = apps.get_model('posts', 'SearchTerm')
+    use_fts = (
+        settings.SEARCH_BACKEND != 'index'
+        and FTS_TABLE in schema_editor.connection.introspection.table_names()
+    )
+    posts = Post.objects.values_list('pk', 'text').iterator()
+    comments = Comment.objects.values_list('post_id', 'pk', 'text')
+    documents = chain(((pk, None, text) for pk, text in posts),
+                      comments.iterator())
+    for post_id, comment_id, text in documents:
+        terms = tokenize(text)
+        if use_fts:
+            FTS5Backend().index(post_id, comment_id, terms)
+            continue
+        SearchTerm.objects.bulk_create([
+            SearchTerm(term=term, post_id=post_id, comment_id=comment_id,
+                       frequency=frequency)
+            for term, frequency in Counter(terms).items()
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0007_image_blobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchTerm',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64, verbose_name='Основа слова')),
+                ('frequency', models.PositiveIntegerField(default=1)),
+                ('comment', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='posts.Comment')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='posts.Post')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='searchterm',
+            index=models.Index(fields=['term', 'post'], name='search_term_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='searchterm',
+            index=models.Index(fields=['post', 'comment'], name='search_document_idx'),
+        ),
+        migrations.RunPython(create_fts_table, drop_fts_table),
+        migrations.RunPython(fill_search_index, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,11 @@
+import json
+
 from core.models import CreatedModel
 from django.contrib.auth import get_user_model
 from django.db import models
 
+from .storage import ContentAddressedStorage
+
 User = get_user_model()
 
 
@@ -17,9 +21,35 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+
+    def for_feed(self):
+        """Посты для ленты: автор и группа одним запросом,
+        без неиспользуемых в карточке поста колонок."""
+        return self.select_related('author__profile', 'group').only(
+            'text', 'pub_date', 'updated', 'image', 'thumbnail',
+            'image_variants', 'comments_count', 'author', 'author__username',
+            'author__profile__display_name',
+            'group', 'group__title', 'group__slug',
+        )
+
+
+class CommentQuerySet(models.QuerySet):
+
+    def for_thread(self):
+        """Комментарии в порядке написания с автором одним запросом."""
+        return self.select_related('author').only(
+            'text', 'created', 'post', 'author', 'author__username',
+            'author__first_name', 'author__last_name',
+        ).order_by('created', 'pk')
+
+
 class Post(CreatedModel):
     text = models.TextField('Текст поста')
     pub_date = models.DateTimeField('Дата публикации', auto_now_add=True)
+    # Меняется при каждом save(); изменения через update() должны
+    # выставлять его сами. По нему кэшируются карточки постов.
+    updated = models.DateTimeField('Дата изменения', auto_now=True)
     author = models.ForeignKey(User,
                                on_delete=models.CASCADE,
                                related_name='posts',
@@ -33,11 +63,53 @@ class Post(CreatedModel):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
-        blank=True
+        blank=True,
+        storage=ContentAddressedStorage(),
+    )
+    # Заполняются фоновой задачей posts.thumbnails после загрузки.
+    thumbnail = models.ImageField(
+        'Миниатюра',
+        upload_to='posts/thumbs/',
+        blank=True,
+        editable=False,
+    )
+    image_variants = models.TextField(
+        'Варианты картинки',
+        blank=True,
+        editable=False,
+    )
+    image_width = models.PositiveIntegerField(
+        'Ширина картинки', null=True, editable=False)
+    image_height = models.PositiveIntegerField(
+        'Высота картинки', null=True, editable=False)
+    comments_count = models.PositiveIntegerField(
+        'Комментариев',
+        default=0,
+        editable=False,
     )
 
+    objects = PostQuerySet.as_manager()
+
     class Meta:
         ordering = ['-pub_date']
+        # Ленты читаются по (pub_date, id) от новых к старым: SQLite
+        # проходит эти индексы в обратном порядке, id берётся из rowid.
+        indexes = [
+            models.Index(fields=['pub_date'], name='post_pub_date_idx'),
+            models.Index(fields=['author', 'pub_date'],
+                         name='post_author_pub_date_idx'),
+            models.Index(fields=['group', 'pub_date'],
+                         name='post_group_pub_date_idx'),
+        ]
+
+    @property
+    def variants(self):
+        """{формат: [[ширина, имя файла], ...]} из posts.thumbnails."""
+        try:
+            variants = json.loads(self.image_variants)
+        except ValueError:
+            return {}
+        return variants if isinstance(variants, dict) else {}
 
     def __str__(self):
         # выводим текст поста
@@ -57,6 +129,14 @@ class Comment(models.Model):
     text = models.TextField('Текст комментария')
     created = models.DateTimeField('Дата публикации', auto_now_add=True)
 
+    objects = CommentQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['post', 'created'],
+                         name='comment_post_created_idx'),
+        ]
+
 
 class Follow(models.Model):
     user = models.ForeignKey(User,
@@ -76,3 +156,61 @@ class Follow(models.Model):
                 fields=['user', 'author'], name='unique_following'
             )
         ]
+
+
+class TimelineEntry(models.Model):
+    """Пост в ленте подписок пользователя (fan-out on write)."""
+    user = models.ForeignKey(User,
+                             on_delete=models.CASCADE,
+                             related_name='timeline',
+                             )
+    post = models.ForeignKey(Post,
+                             on_delete=models.CASCADE,
+                             related_name='timeline_entries',
+                             )
+    # Копия post.pub_date: лента читается по индексу этой таблицы.
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'], name='unique_timeline_entry'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['user', 'pub_date', 'post'],
+                         name='timeline_user_pub_date_idx'),
+        ]
+
+
+class ImageBlob(models.Model):
+    """Файл картинки в хранилище, общий для постов с одинаковым
+    содержимым."""
+    sha256 = models.CharField('SHA-256', max_length=64, primary_key=True)
+    name = models.CharField('Имя файла', max_length=255, unique=True)
+    # Число постов, ссылающихся на файл; при нуле файл удаляется.
+    references = models.PositiveIntegerField(default=0)
+
+
+class SearchTerm(models.Model):
+    """Запись обратного индекса поиска: основа слова в тексте поста или
+    комментария (posts.search)."""
+    term = models.CharField('Основа слова', max_length=64)
+    post = models.ForeignKey(Post,
+                             on_delete=models.CASCADE,
+                             related_name='+',
+                             )
+    # Пусто — слово из текста самого поста.
+    comment = models.ForeignKey(Comment,
+                                null=True,
+                                on_delete=models.CASCADE,
+                                related_name='+',
+                                )
+    frequency = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['term', 'post'], name='search_term_idx'),
+            models.Index(fields=['post', 'comment'],
+                         name='search_document_idx'),
+        ]
@@ -0,0 +1,237 @@
+from django.core.paginator import EmptyPage, Page, Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+from django.utils.dateparse import parse_datetime
+from django.utils.encoding import force_bytes, force_str
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+from . import feed_counts
+
+POSTS_PER_PAGE = 10
+COMMENTS_PER_PAGE = 50
+
+
+def encode_cursor(obj, date_field='pub_date'):
+    """Кодирует позицию записи в ленте: пару (дата, id)."""
+    raw = f'{getattr(obj, date_field).isoformat()}|{obj.pk}'
+    return urlsafe_base64_encode(force_bytes(raw))
+
+
+def decode_cursor(cursor):
+    """Возвращает пару (pub_date, id) или None для битого курсора."""
+    try:
+        raw = force_str(urlsafe_base64_decode(cursor))
+        pub_date, pk = raw.rsplit('|', 1)
+        pub_date = parse_datetime(pub_date)
+        pk = int(pk)
+    except (TypeError, ValueError, UnicodeDecodeError):
+        return None
+    if pub_date is None:
+        return None
+    return pub_date, pk
+
+
+class CursorPage(Page):
+    """Страница ленты, полученная по курсору, без подсчёта строк."""
+
+    def __init__(self, object_list, paginator, direction, cursor,
+                 has_next, has_previous):
+        super().__init__(object_list, None, paginator)
+        self.direction = direction
+        self.cursor = cursor
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    def start_index(self):
+        return None
+
+    def end_index(self):
+        return None
+
+
+class KeysetPaginator(Paginator):
+    """Паджинатор ленты постов.
+
+    Номерные страницы (?page=N) работают как у обычного Paginator,
+    страницы по курсору (?after=... / ?before=...) читаются диапазоном
+    по индексу (pub_date, id) без COUNT(*) и OFFSET. Последняя страница
+    (?last=1) — самые старые записи, прочитанные с конца индекса.
+
+    key — поля queryset, по которым упорядочена лента; их значения
+    должны совпадать с pub_date и id поста.
+
+    С count_scope — областью ленты из posts.feed_counts — число записей
+    для номерных страниц не считается COUNT(*) на каждый запрос, а
+    берётся из feed_counts. Если страница показывает, что число
+    разошлось с лентой, записи пересчитываются.
+    """
+    key = ('pub_date', 'pk')
+
+    def __init__(self, object_list, per_page=POSTS_PER_PAGE, key=None,
+                 count_scope=None, **kwargs):
+        if key is not None:
+            self.key = key
+        self.count_scope = count_scope
+        date_field, id_field = self.key
+        super().__init__(
+            object_list.order_by(f'-{date_field}', f'-{id_field}'),
+            per_page, **kwargs)
+
+    @cached_property
+    def count(self):
+        if self.count_scope is None:
+            return super().count
+        return feed_counts.get(self.count_scope)
+
+    def recount(self):
+        """Считает записи заново и обновляет число в feed_counts."""
+        self.__dict__['count'] = feed_counts.store(
+            self.count_scope, self.object_list.count())
+        self.__dict__.pop('num_pages', None)
+        # Число теперь точное: дальше это обычный Paginator.
+        self.count_scope = None
+
+    def validate_number(self, number):
+        try:
+            return super().validate_number(number)
+        except EmptyPage:
+            if self.count_scope is None:
+                raise
+            # Оценка могла отстать от ленты.
+            self.recount()
+            return super().validate_number(number)
+
+    def page(self, number):
+        if self.count_scope is None:
+            return super().page(number)
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        top = bottom + self.per_page
+        # Лишняя запись показывает, есть ли следующая страница.
+        rows = list(self.object_list[bottom:top + 1])
+        if (len(rows) > self.per_page) != (number < self.num_pages):
+            # Оценка разошлась с лентой.
+            self.recount()
+            return super().page(min(number, self.num_pages))
+        # Страница остаётся QuerySet, уже заполненным прочитанными
+        # записями, как у обычного Paginator.
+        object_list = self.object_list[bottom:top]
+        object_list._result_cache = rows[:self.per_page]
+        return self._get_page(object_list, number, self)
+
+    def get_cursor_page(self, after=None, before=None):
+        """Страница после (или до) курсора; None, если курсор битый
+        или за ним нет записей (например, их удалили)."""
+        position = decode_cursor(after or before)
+        if position is None:
+            return None
+        # Условие записано как диапазон по дате, чтобы SQLite читал
+        # индекс, а не объединял две выборки через MULTI-INDEX OR.
+        if after:
+            object_list = self.object_list.filter(
+                self.cursor_filter(position, 'lte', 'gte'))
+        else:
+            object_list = self.object_list.filter(
+                self.cursor_filter(position, 'gte', 'lte')).reverse()
+        object_list = list(object_list[:self.per_page + 1])
+        if not object_list:
+            return None
+        has_more = len(object_list) > self.per_page
+        object_list = object_list[:self.per_page]
+        if before:
+            object_list.reverse()
+            # Перед страницей с «before» есть ещё записи, если мы
+            # упёрлись в лимит; после неё запись точно есть — курсор.
+            return CursorPage(object_list, self, 'before', before,
+                              has_next=True, has_previous=has_more)
+        return CursorPage(object_list, self, 'after', after,
+                          has_next=has_more, has_previous=True)
+
+    def get_last_page(self):
+        """Самые старые записи ленты обратным чтением по индексу, без
+        OFFSET через всю ленту; None, если лента пуста."""
+        object_list = list(self.object_list.reverse()[:self.per_page + 1])
+        if not object_list:
+            return None
+        has_more = len(object_list) > self.per_page
+        object_list = object_list[:self.per_page]
+        object_list.reverse()
+        return CursorPage(object_list, self, 'last', None,
+                          has_next=False, has_previous=has_more)
+
+    def cursor_filter(self, position, date_lookup, id_lookup):
+        date_field, id_field = self.key
+        pub_date, pk = position
+        return (
+            Q(**{f'{date_field}__{date_lookup}': pub_date})
+            & ~Q(**{date_field: pub_date, f'{id_field}__{id_lookup}': pk})
+        )
+
+
+def elided_page_range(number, num_pages, on_each_side=2, on_ends=1):
+    """Номера страниц вокруг текущей и по краям; None — пропуск."""
+    window = range(max(number - on_each_side, 1),
+                   min(number + on_each_side, num_pages) + 1)
+    pages = sorted({*range(1, min(on_ends, num_pages) + 1), *window,
+                    *range(max(num_pages - on_ends + 1, 1), num_pages + 1)})
+    previous = 0
+    for page in pages:
+        # Пропуск в одну страницу короче многоточия: показываем её.
+        if page - previous == 2:
+            yield page - 1
+        elif page - previous > 2:
+            yield None
+        yield page
+        previous = page
+
+
+def paginate(request, queryset, key=None, count_scope=None):
+    """Возвращает страницу ленты по параметрам запроса."""
+    paginator = KeysetPaginator(queryset, key=key, count_scope=count_scope)
+    if request.GET.get('last'):
+        page_obj = paginator.get_last_page()
+        if page_obj is not None:
+            return page_obj
+    after = request.GET.get('after')
+    before = request.GET.get('before')
+    if after or before:
+        page_obj = paginator.get_cursor_page(after=after, before=before)
+        if page_obj is not None:
+            return page_obj
+    # Без курсора, с битым курсором, с пустой страницей по курсору
+    # или в пустой ленте показывается номерная страница.
+    return paginator.get_page(request.GET.get('page'))
+
+
+def comments_after(queryset, after=None):
+    """Комментарии после курсора after в порядке написания; битый
+    курсор читается как начало обсуждения."""
+    queryset = queryset.order_by('created', 'pk')
+    position = decode_cursor(after) if after else None
+    if position is not None:
+        created, pk = position
+        queryset = queryset.filter(
+            Q(created__gte=created) & ~Q(created=created, pk__lte=pk))
+    return queryset
+
+
+def comments_page(queryset, after=None, per_page=COMMENTS_PER_PAGE):
+    """Порция комментариев после курсора after в порядке написания.
+
+    Возвращает список комментариев и курсор следующей порции или None,
+    если порция последняя.
+    """
+    comments = list(comments_after(queryset, after)[:per_page + 1])
+    if len(comments) <= per_page:
+        return comments, None
+    comments = comments[:per_page]
+    return comments, encode_cursor(comments[-1], 'created')
@@ -0,0 +1,267 @@
+"""Полнотекстовый поиск по постам и комментариям.
+
+Текст разбивается на слова, русские слова приводятся к основе
+стеммером Портера, и в индекс попадают уже основы: «котики» и «котов»
+находятся по запросу «кот». Найденные комментарии поднимают в выдаче
+свой пост, но с меньшим весом, чем совпадение в тексте самого поста.
+
+Пост находится, если каждое слово запроса есть в его тексте или
+в одном из его комментариев.
+
+Индексов два, работает один из них:
+
+* fts5 — виртуальная таблица SQLite FTS5 с ранжированием bm25;
+* index — обратный индекс в таблице SearchTerm с ранжированием TF-IDF
+  на Python, для других СУБД и сборок SQLite без FTS5.
+
+Настройка SEARCH_BACKEND выбирает индекс: 'fts5', 'index' или 'auto' —
+FTS5, если его таблица есть в базе. Индекс обновляется сигналами при
+сохранении и удалении; собрать его заново — manage.py search_index.
+Уже написанные посты и комментарии индексирует миграция 0008_search.
+"""
+import math
+import re
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection
+
+from .counters import batches
+from .models import Comment, Post, SearchTerm
+
+FTS_TABLE = 'posts_search_fts'
+POST_WEIGHT = 2.0
+COMMENT_WEIGHT = 1.0
+
+WORD_RE = re.compile(r'\w+')
+CYRILLIC_RE = re.compile(r'[а-я]+')
+
+# Стеммер Портера для русского языка.
+RV_RE = re.compile(r'^(.*?[аеиоуыэюя])(.*)$')
+PERFECTIVE_GERUND_RE = re.compile(
+    r'((ив|ивши|ившись|ыв|ывши|ывшись)|((?<=[ая])(в|вши|вшись)))$')
+REFLEXIVE_RE = re.compile(r'(с[яь])$')
+ADJECTIVE_RE = re.compile(
+    r'(ее|ие|ые|ое|ими|ыми|ей|ий|ый|ой|ем|им|ым|ом|его|ого|ему|ому|их|ых|'
+    r'ую|юю|ая|яя|ою|ею)$')
+PARTICIPLE_RE = re.compile(r'((ивш|ывш|ующ)|((?<=[ая])(ем|нн|вш|ющ|щ)))$')
+VERB_RE = re.compile(
+    r'((ила|ыла|ена|ейте|уйте|ите|или|ыли|ей|уй|ил|ыл|им|ым|ен|ило|ыло|'
+    r'ено|ят|ует|уют|ит|ыт|ены|ить|ыть|ишь|ую|ю)|((?<=[ая])(ла|на|ете|'
+    r'йте|ли|й|л|ем|н|ло|но|ет|ют|ны|ть|ешь|нно)))$')
+NOUN_RE = re.compile(
+    r'(а|ев|ов|ие|ье|е|иями|ями|ами|еи|ии|и|ией|ей|ой|ий|й|иям|ям|ием|'
+    r'ем|ам|ом|о|у|ах|иях|ях|ы|ь|ию|ью|ю|ия|ья|я)$')
+DERIVATIONAL_RE = re.compile(r'.*[^аеиоуыэюя]+[аеиоуыэюя].*ость?$')
+SUPERLATIVE_RE = re.compile(r'(ейше|ейш)$')
+
+
+def stem(word):
+    """Основа русского слова; слова без гласных не меняются."""
+    match = RV_RE.match(word)
+    if not match:
+        return word
+    prefix, rv = match.groups()
+    without_gerund = PERFECTIVE_GERUND_RE.sub('', rv, 1)
+    if without_gerund != rv:
+        rv = without_gerund
+    else:
+        rv = REFLEXIVE_RE.sub('', rv, 1)
+        without_adjective = ADJECTIVE_RE.sub('', rv, 1)
+        if without_adjective != rv:
+            rv = PARTICIPLE_RE.sub('', without_adjective, 1)
+        else:
+            without_verb = VERB_RE.sub('', rv, 1)
+            if without_verb != rv:
+                rv = without_verb
+            else:
+                rv = NOUN_RE.sub('', rv, 1)
+    rv = re.sub('и$', '', rv, 1)
+    if DERIVATIONAL_RE.match(rv):
+        rv = re.sub('ость?$', '', rv, 1)
+    if rv.endswith('ь'):
+        rv = rv[:-1]
+    else:
+        rv = SUPERLATIVE_RE.sub('', rv, 1)
+        rv = re.sub('нн$', 'н', rv, 1)
+    return prefix + rv
+
+
+def tokenize(text):
+    """Основы слов текста в порядке следования."""
+    terms = []
+    for word in WORD_RE.findall(text.lower().replace('ё', 'е')):
+        if len(word) < 2:
+            continue
+        if CYRILLIC_RE.fullmatch(word):
+            word = stem(word)
+        terms.append(word[:SearchTerm._meta.get_field('term').max_length])
+    return terms
+
+
+class FTS5Backend:
+    """Индекс в виртуальной таблице FTS5.
+
+    rowid записи — чётный для поста и нечётный для комментария, поэтому
+    запись меняется и удаляется по первичному ключу без поиска.
+    """
+
+    @staticmethod
+    def rowid(post_id, comment_id):
+        if comment_id is None:
+            return post_id * 2
+        return comment_id * 2 + 1
+
+    def index(self, post_id, comment_id, terms):
+        rowid = self.rowid(post_id, comment_id)
+        post_text, comment_text = ' '.join(terms), ''
+        if comment_id is not None:
+            post_text, comment_text = comment_text, post_text
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [rowid])
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} '
+                f'(rowid, post_text, comment_text, post_id) '
+                f'VALUES (%s, %s, %s, %s)',
+                [rowid, post_text, comment_text, post_id])
+
+    def remove(self, post_id, comment_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                           [self.rowid(post_id, comment_id)])
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+
+    def search(self, terms, limit):
+        # Слово запроса может найтись в посте или в любом из его
+        # комментариев, поэтому каждое слово ищется отдельно, а пост
+        # должен найтись по всем. Основы состоят только из букв и цифр,
+        # поэтому кавычки внутри них не встречаются. Функцию bm25 нельзя
+        # звать внутри GROUP BY, а скрытый столбец rank с заданными
+        # через MATCH весами — можно.
+        per_term = (
+            f'SELECT post_id, MIN(rank) AS score FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s AND rank MATCH %s GROUP BY post_id')
+        weights = f'bm25({POST_WEIGHT}, {COMMENT_WEIGHT})'
+        params = []
+        for term in terms:
+            params += [f'"{term}"', weights]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT post_id, SUM(score) AS total FROM ('
+                + ' UNION ALL '.join([per_term] * len(terms))
+                + ') GROUP BY post_id HAVING COUNT(*) = %s '
+                'ORDER BY total, post_id DESC LIMIT %s',
+                params + [len(terms), limit])
+            return [post_id for post_id, _ in cursor.fetchall()]
+
+
+class InvertedIndexBackend:
+    """Обратный индекс в таблице SearchTerm.
+
+    Вес слова — частота, умноженная на IDF.
+    """
+
+    def index(self, post_id, comment_id, terms):
+        SearchTerm.objects.filter(
+            post_id=post_id, comment_id=comment_id).delete()
+        frequencies = defaultdict(int)
+        for term in terms:
+            frequencies[term] += 1
+        SearchTerm.objects.bulk_create([
+            SearchTerm(term=term, post_id=post_id, comment_id=comment_id,
+                       frequency=frequency)
+            for term, frequency in frequencies.items()
+        ])
+
+    def remove(self, post_id, comment_id):
+        # Записи удаляются каскадом вместе с постом или комментарием.
+        pass
+
+    def clear(self):
+        SearchTerm.objects.all().delete()
+
+    def search(self, terms, limit):
+        rows = list(SearchTerm.objects.filter(term__in=terms).values_list(
+            'term', 'post_id', 'comment_id', 'frequency'))
+        documents = defaultdict(set)
+        for term, post_id, _, _ in rows:
+            documents[term].add(post_id)
+        total = max(Post.objects.count(), 1)
+        scores = defaultdict(float)
+        matched = defaultdict(set)
+        for term, post_id, comment_id, frequency in rows:
+            weight = COMMENT_WEIGHT if comment_id else POST_WEIGHT
+            idf = math.log(1 + total / len(documents[term]))
+            scores[post_id] += weight * (1 + math.log(frequency)) * idf
+            matched[post_id].add(term)
+        found = [post_id for post_id, post_terms in matched.items()
+                 if len(post_terms) == len(terms)]
+        found.sort(key=lambda post_id: (-scores[post_id], -post_id))
+        return found[:limit]
+
+
+BACKENDS = {
+    'fts5': FTS5Backend(),
+    'index': InvertedIndexBackend(),
+}
+
+_fts5_tables = {}
+
+
+def fts5_available():
+    """Есть ли в текущей базе таблица FTS5 (её создаёт миграция)."""
+    if connection.vendor != 'sqlite':
+        return False
+    name = connection.settings_dict['NAME']
+    if name not in _fts5_tables:
+        _fts5_tables[name] = (
+            FTS_TABLE in connection.introspection.table_names())
+    return _fts5_tables[name]
+
+
+def get_backend():
+    name = settings.SEARCH_BACKEND
+    if name == 'auto':
+        name = 'fts5' if fts5_available() else 'index'
+    return BACKENDS[name]
+
+
+def index_post(post):
+    get_backend().index(post.pk, None, tokenize(post.text))
+
+
+def remove_post(post):
+    get_backend().remove(post.pk, None)
+
+
+def index_comment(comment):
+    get_backend().index(comment.post_id, comment.pk, tokenize(comment.text))
+
+
+def remove_comment(comment):
+    get_backend().remove(comment.post_id, comment.pk)
+
+
+def search(query, limit=None):
+    """id постов по запросу, от самых подходящих."""
+    terms = list(dict.fromkeys(tokenize(query)))
+    if not terms:
+        return []
+    return get_backend().search(terms, limit or settings.SEARCH_MAX_RESULTS)
+
+
+def rebuild(batch_size):
+    """Заново индексирует все посты и комментарии; возвращает их число."""
+    backend = get_backend()
+    backend.clear()
+    total = 0
+    for model, index in ((Post, index_post), (Comment, index_comment)):
+        for ids in batches(model.objects.all(), batch_size):
+            for document in model.objects.filter(pk__in=ids):
+                index(document)
+            total += len(ids)
+    return total
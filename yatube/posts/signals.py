@@ -0,0 +1,161 @@
+from django.db import transaction
+from django.db.models.signals import (post_delete, post_init, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+
+from users.models import Profile
+
+from . import cache, counters, feed_counts, search, thumbnails, timeline
+from .models import Comment, Follow, Group, ImageBlob, Post
+
+
+def release_image(name):
+    """Снимает ссылку на файл картинки и удаляет файл, если ссылок
+    больше нет."""
+    if not name:
+        return
+    counters.change_image_references(name, -1)
+    deleted, _ = ImageBlob.objects.filter(name=name, references=0).delete()
+    if deleted:
+        transaction.on_commit(lambda: thumbnails.delete_files(name))
+
+
+@receiver(post_init, sender=Post)
+def remember_group(sender, instance, **kwargs):
+    # Группа, в ленте которой пост был до редактирования. Читаем
+    # __dict__, чтобы не загружать отложенное поле отдельным запросом.
+    instance._loaded_group_id = instance.__dict__.get('group_id')
+    # Имя картинки из БД; None — поле не загружено и прежнее имя
+    # неизвестно.
+    image = instance.__dict__.get('image')
+    instance._loaded_image = image if isinstance(image, str) else None
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.change_posts_count(instance.author_id, 1)
+        timeline.fan_out(instance)
+        feed_counts.change(feed_counts.post_scopes(instance), 1)
+    elif instance._loaded_group_id != instance.group_id:
+        move_between_groups(instance._loaded_group_id, instance.group_id)
+    cache.bump(*cache.post_scopes(
+        instance, group_ids=[instance._loaded_group_id]))
+    instance._loaded_group_id = instance.group_id
+    update_image_references(instance, created)
+    if 'text' in instance.__dict__:
+        search.index_post(instance)
+
+
+def move_between_groups(old_group_id, new_group_id):
+    if old_group_id is not None:
+        feed_counts.change([('group', old_group_id)], -1)
+    if new_group_id is not None:
+        feed_counts.change([('group', new_group_id)], 1)
+
+
+def update_image_references(instance, created):
+    if 'image' not in instance.__dict__:
+        return
+    old_image = '' if created else instance._loaded_image
+    new_image = instance.image.name or ''
+    if old_image is None or old_image == new_image:
+        return
+    if new_image:
+        counters.change_image_references(new_image, 1)
+    release_image(old_image)
+    instance._loaded_image = new_image
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    counters.change_posts_count(instance.author_id, -1)
+    feed_counts.change(feed_counts.post_scopes(instance), -1)
+    cache.bump(*cache.post_scopes(instance))
+    if 'image' in instance.__dict__:
+        release_image(instance.image.name)
+    search.remove_post(instance)
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, **kwargs):
+    if created:
+        counters.change_comments_count(instance.post_id, 1)
+    search.index_comment(instance)
+    cache.bump(('post', instance.post_id))
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counters.change_comments_count(instance.post_id, -1)
+    search.remove_comment(instance)
+    cache.bump(('post', instance.post_id))
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        counters.change_followers_count(instance.author_id, 1)
+        timeline.backfill(instance.user_id, instance.author_id)
+        feed_counts.forget(('follow', instance.user_id))
+        cache.bump(('follow', instance.user_id))
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    counters.change_followers_count(instance.author_id, -1)
+    timeline.prune(instance.user_id, instance.author_id)
+    user_ids = [instance.user_id, *timeline.cool_down(instance.author_id)]
+    for user_id in user_ids:
+        feed_counts.forget(('follow', user_id))
+    cache.bump(*[('follow', user_id) for user_id in user_ids])
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, created, **kwargs):
+    # Название и адрес группы есть в карточках её постов на главной
+    # (и в ленте подписок, версия которой включает главную), в ленте
+    # группы и в профилях её авторов.
+    if created:
+        return
+    cache.bump(*group_scopes(instance.pk, group_author_ids(instance)))
+
+
+@receiver(pre_delete, sender=Group)
+def group_deleting(sender, instance, **kwargs):
+    # После удаления группы её посты обнуляют group_id одним UPDATE,
+    # без сигналов Post, поэтому авторов запоминаем заранее.
+    instance._author_ids = list(group_author_ids(instance))
+
+
+@receiver(post_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    cache.bump(*group_scopes(instance.pk, instance._author_ids))
+
+
+def group_author_ids(group):
+    return Post.objects.filter(group=group).order_by().values_list(
+        'author_id', flat=True).distinct()
+
+
+def group_scopes(group_id, author_ids):
+    return [('index',), ('group', group_id),
+            *[('profile', author_id) for author_id in author_ids]]
+
+
+@receiver(post_save, sender=Profile)
+def profile_saved(sender, instance, created, update_fields, **kwargs):
+    # Подпись автора есть в карточках его постов на главной, в его
+    # профиле, в лентах групп, где он писал, и в комментариях к постам.
+    if created or (update_fields is not None
+                   and 'display_name' not in update_fields):
+        return
+    group_ids = Post.objects.filter(
+        author_id=instance.user_id, group__isnull=False).order_by(
+    ).values_list('group_id', flat=True).distinct()
+    commented_ids = Comment.objects.filter(
+        author_id=instance.user_id).order_by().values_list(
+        'post_id', flat=True).distinct()
+    cache.bump(('index',), ('profile', instance.user_id),
+               *[('group', group_id) for group_id in group_ids],
+               *[('post', post_id) for post_id in commented_ids])
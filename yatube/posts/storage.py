@@ -0,0 +1,51 @@
+"""Хранилище картинок постов с дедупликацией по содержимому.
+
+Файлы хранятся как в FileSystemStorage, но каждый файл учтён в таблице
+ImageBlob под SHA-256 своего содержимого. Повторная загрузка той же
+картинки не пишет новый файл, а возвращает имя уже сохранённого, поэтому
+и миниатюры, имена которых зависят только от имени картинки, строятся
+один раз. Сколько постов ссылается на файл, считают сигналы posts;
+файл удаляется, когда ссылок не осталось.
+"""
+import hashlib
+
+from django.apps import apps
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, transaction
+
+
+def content_sha256(content):
+    """SHA-256 файла; посчитанный при приёмке берётся готовым."""
+    digest = getattr(content, 'content_sha256', None)
+    if digest:
+        return digest
+    sha256 = hashlib.sha256()
+    for chunk in content.chunks():
+        sha256.update(chunk)
+    content.seek(0)
+    return sha256.hexdigest()
+
+
+class ContentAddressedStorage(FileSystemStorage):
+
+    @property
+    def blobs(self):
+        return apps.get_model('posts', 'ImageBlob').objects
+
+    def _save(self, name, content):
+        digest = content_sha256(content)
+        existing = self.blobs.filter(sha256=digest).first()
+        if existing is not None:
+            if self.exists(existing.name):
+                return existing.name
+            # Файл пропал с диска: запишем его заново под новым именем.
+            existing.delete()
+        name = super()._save(name, content)
+        try:
+            with transaction.atomic():
+                self.blobs.create(sha256=digest, name=name)
+        except IntegrityError:
+            # Ту же картинку параллельно сохранил другой запрос.
+            super().delete(name)
+            return self.blobs.get(sha256=digest).name
+        return name
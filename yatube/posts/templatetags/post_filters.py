@@ -0,0 +1,119 @@
+from core import rendering
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.html import format_html, format_html_join
+from django.utils.safestring import mark_safe
+
+from .. import links
+from ..cache import card_key
+from ..paginators import KeysetPaginator, elided_page_range, encode_cursor
+from ..thumbnails import THUMBNAIL_SIZE
+
+register = template.Library()
+
+POST_CARD_TEMPLATE = 'posts/includes/post_list.html'
+
+# Картинка занимает всю ширину колонки, но не больше THUMBNAIL_SIZE.
+IMAGE_SIZES = '(min-width: 992px) 960px, 100vw'
+SOURCE_FORMATS = ('avif', 'webp')
+
+
+@register.filter
+def cursor(post):
+    return encode_cursor(post)
+
+
+@register.filter
+def next_page_query(page_obj):
+    """Параметр ссылки на следующую страницу: курсор в лентах
+    с KeysetPaginator, номер страницы у обычного Paginator (поиск)."""
+    if isinstance(page_obj.paginator, KeysetPaginator):
+        return f'after={encode_cursor(page_obj[-1])}'
+    return f'page={page_obj.next_page_number()}'
+
+
+@register.filter
+def page_query(page_obj, number):
+    """Параметр ссылки на номерную страницу. Последнюю страницу ленты
+    с KeysetPaginator читаем с конца (?last=1), а не через OFFSET."""
+    paginator = page_obj.paginator
+    if (isinstance(paginator, KeysetPaginator) and number > 1
+            and number == paginator.num_pages):
+        return 'last=1'
+    return f'page={number}'
+
+
+register.filter('profile_url', links.profile_url)
+register.filter('group_url', links.group_url)
+register.filter('post_url', links.post_url)
+register.filter('author_name', rendering.author_name)
+register.filter('local_date', rendering.local_date, expects_localtime=True)
+
+
+@register.simple_tag(takes_context=True)
+def post_cards(context, posts):
+    """HTML карточек постов ленты.
+
+    Готовые карточки читаются из кэша одним get_many (см.
+    posts.cache.card_key). Шаблон карточки для остальных ищется один
+    раз на ленту, а не {% include %} на каждый пост.
+    """
+    # Записи страницы читаются из object_list: обход самой Page
+    # подменил бы QuerySet списком.
+    posts = list(getattr(posts, 'object_list', posts))
+    keys = [card_key(post) for post in posts]
+    cards = cache.get_many(keys)
+    missing = {key: post for key, post in zip(keys, posts)
+               if key not in cards}
+    if missing:
+        card = context.template.engine.get_template(POST_CARD_TEMPLATE)
+        rendered = {}
+        for key, post in missing.items():
+            with context.push(post=post):
+                rendered[key] = str(card.render(context))
+        cache.set_many(rendered, settings.FEED_CACHE_TIMEOUT)
+        cards.update(rendered)
+    return [mark_safe(cards[key]) for key in keys]
+
+
+@register.simple_tag
+def page_window(page_obj):
+    """Номера страниц для навигации; None — пропуск."""
+    return list(elided_page_range(page_obj.number,
+                                  page_obj.paginator.num_pages))
+
+
+@register.filter
+def thumbnail_url(post):
+    """Адрес готовой миниатюры или, пока её нет, самой картинки."""
+    if post.thumbnail:
+        return post.thumbnail.url
+    return post.image.url
+
+
+def srcset(storage, variants):
+    return ', '.join(f'{storage.url(name)} {width}w'
+                     for width, name in variants)
+
+
+@register.simple_tag
+def post_image(post, css_class='card-img my-2'):
+    """<picture> с вариантами картинки поста разной ширины и формата."""
+    variants = post.variants
+    if 'jpeg' not in variants:
+        return format_html('<img class="{}" src="{}" alt="">',
+                           css_class, thumbnail_url(post))
+    storage = post.image.storage
+    sources = format_html_join(
+        '', '<source type="image/{}" srcset="{}" sizes="{}">',
+        ((fmt, srcset(storage, variants[fmt]), IMAGE_SIZES)
+         for fmt in SOURCE_FORMATS if fmt in variants),
+    )
+    width, height = THUMBNAIL_SIZE
+    return format_html(
+        '<picture>{}<img class="{}" src="{}" srcset="{}" sizes="{}" '
+        'width="{}" height="{}" loading="lazy" alt=""></picture>',
+        sources, css_class, post.thumbnail.url,
+        srcset(storage, variants['jpeg']), IMAGE_SIZES, width, height,
+    )
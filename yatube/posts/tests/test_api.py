@@ -0,0 +1,148 @@
+import json
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from ..models import Comment, Group, Post, User
+from ..paginators import POSTS_PER_PAGE, encode_cursor
+
+
+class ApiTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(
+            username='HasNoName', first_name='Лев', last_name='Толстой')
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='test_group')
+        cls.posts = [
+            Post.objects.create(
+                author=cls.user, group=cls.group, text=f'Пост {i}')
+            for i in range(POSTS_PER_PAGE + 1)
+        ]
+        cls.post = cls.posts[-1]
+
+    def setUp(self):
+        cache.clear()
+
+    def get_json(self, url, **headers):
+        response = self.client.get(url, **headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        return response, json.loads(response.content)
+
+    def test_feeds(self):
+        """Ленты отдают посты страницами со ссылками на соседние."""
+        urls = [
+            reverse('posts:api_index'),
+            reverse('posts:api_group_posts', args=[self.group.slug]),
+            reverse('posts:api_profile', args=[self.user.username]),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                _, data = self.get_json(url)
+                self.assertEqual(len(data['results']), POSTS_PER_PAGE)
+                first = data['results'][0]
+                self.assertEqual(first['id'], self.post.pk)
+                self.assertEqual(first['author']['full_name'], 'Лев Толстой')
+                self.assertEqual(first['group']['slug'], self.group.slug)
+                self.assertIsNone(data['previous'])
+                _, data = self.get_json(data['next'])
+                self.assertEqual(
+                    [post['id'] for post in data['results']],
+                    [self.posts[0].pk])
+                self.assertIsNone(data['next'])
+
+    def test_cursor_past_end(self):
+        """Курсор, за которым не осталось постов, отдаёт первую
+        страницу."""
+        oldest = Post.objects.get(pk=self.posts[0].pk)
+        oldest.pub_date = oldest.pub_date.replace(year=2000)
+        _, data = self.get_json(
+            reverse('posts:api_index') + f'?after={encode_cursor(oldest)}')
+        self.assertEqual(data['results'][0]['id'], self.post.pk)
+        self.assertIsNone(data['previous'])
+
+    def test_post_and_comments(self):
+        Comment.objects.create(
+            post=self.post, author=self.user, text='Комментарий')
+        _, data = self.get_json(
+            reverse('posts:api_post_detail', args=[self.post.pk]))
+        self.assertEqual(data['text'], self.post.text)
+        self.assertEqual(data['comments_count'], 1)
+        _, data = self.get_json(
+            reverse('posts:api_post_comments', args=[self.post.pk]))
+        self.assertEqual(data['results'][0]['text'], 'Комментарий')
+
+    def test_not_found(self):
+        for url in (
+            reverse('posts:api_group_posts', args=['missing']),
+            reverse('posts:api_post_detail', args=[0]),
+        ):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_read_only(self):
+        response = self.client.post(reverse('posts:api_index'))
+        self.assertEqual(response.status_code, 405)
+
+    def test_not_modified(self):
+        """Неизменившаяся лента отвечает 304 без запроса постов,
+        изменение поста меняет ETag."""
+        url = reverse('posts:api_index')
+        response, _ = self.get_json(url)
+        etag = response['ETag']
+        self.assertIn('Last-Modified', response)
+        # Дата самой новой записи; постов не читаем.
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Новый текст'
+        post.save()
+        response, _ = self.get_json(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_feed_without_comment_counts(self):
+        """Комментарий не меняет ETag ленты, поэтому в ней нет числа
+        комментариев."""
+        _, data = self.get_json(reverse('posts:api_index'))
+        self.assertNotIn('comments_count', data['results'][0])
+
+    def test_comment_changes_etag(self):
+        url = reverse('posts:api_post_comments', args=[self.post.pk])
+        response, _ = self.get_json(url)
+        etag = response['ETag']
+        Comment.objects.create(
+            post=self.post, author=self.user, text='Комментарий')
+        response, data = self.get_json(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(len(data['results']), 1)
+
+    def test_labels_change_post_etag(self):
+        """Новые название группы и подпись автора не скрываются за 304
+        у поста и его комментариев."""
+        commenter = User.objects.create(username='reader', first_name='Иван')
+        Comment.objects.create(
+            post=self.post, author=commenter, text='Комментарий')
+        urls = [reverse('posts:api_post_detail', args=[self.post.pk]),
+                reverse('posts:api_post_comments', args=[self.post.pk])]
+        etags = [self.get_json(url)[0]['ETag'] for url in urls]
+        group = Group.objects.get(pk=self.group.pk)
+        group.title = 'Переименованная группа'
+        group.save()
+        _, data = self.get_json(urls[0], HTTP_IF_NONE_MATCH=etags[0])
+        self.assertEqual(data['group']['title'], 'Переименованная группа')
+        etags[0] = self.client.get(urls[0])['ETag']
+        for user, name in ((self.user, 'Лев Николаевич'),
+                           (commenter, 'Иван Петров')):
+            user = User.objects.get(pk=user.pk)
+            user.first_name, user.last_name = name.split()
+            user.save()
+        _, data = self.get_json(urls[0], HTTP_IF_NONE_MATCH=etags[0])
+        self.assertEqual(data['author']['full_name'], 'Лев Николаевич')
+        _, data = self.get_json(urls[1], HTTP_IF_NONE_MATCH=etags[1])
+        self.assertEqual(
+            data['results'][0]['author']['full_name'], 'Иван Петров')
@@ -0,0 +1,104 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from users.models import Profile
+
+from ..management.commands.audit_indexes import EXPECTED_SORTS
+from ..models import Comment, Follow, Post, TimelineEntry, User
+
+
+class AuditIndexesCommandTest(TestCase):
+
+    def test_feed_queries_use_indexes(self):
+        """Запросы лент читают посты по индексу без сортировки; ленту
+        с популярными авторами сортировать приходится."""
+        out = StringIO()
+        call_command('audit_indexes', stdout=out)
+        plans, plan = {}, []
+        for line in out.getvalue().splitlines():
+            if line.startswith('    '):
+                plan.append(line)
+            else:
+                plan = plans.setdefault(line, [])
+        self.assertIn('posts:follow_index hot ?after=', plans)
+        self.assertIn('posts:post_detail comments ?after=', plans)
+        for name, plan in plans.items():
+            with self.subTest(query=name):
+                sorted_ = any('TEMP B-TREE' in step for step in plan)
+                self.assertEqual(sorted_, name in EXPECTED_SORTS)
+
+
+class RecountCommandTest(TestCase):
+
+    def test_recount_repairs_counters(self):
+        """recount восстанавливает разошедшиеся счётчики."""
+        author = User.objects.create(username='NoNameAuthor')
+        user = User.objects.create(username='HasNoName')
+        post = Post.objects.create(author=author, text='Тестовый текст')
+        Comment.objects.create(post=post, author=user, text='Комментарий')
+        Follow.objects.create(user=user, author=author)
+        Profile.objects.update(posts_count=0, followers_count=7)
+        Post.objects.update(comments_count=3)
+        user.profile.delete()
+
+        call_command('recount', batch_size=1, stdout=StringIO())
+
+        author.profile.refresh_from_db()
+        post.refresh_from_db()
+        self.assertEqual(author.profile.posts_count, 1)
+        self.assertEqual(author.profile.followers_count, 1)
+        self.assertEqual(post.comments_count, 1)
+        self.assertTrue(Profile.objects.filter(user=user).exists())
+
+
+class BenchCommandsTest(TestCase):
+
+    def test_seed_and_bench(self):
+        """seed_bench заполняет базу с согласованными счётчиками и
+        лентами, bench пишет отчёт по каждому представлению."""
+        call_command('seed_bench', users=20, groups=3, posts=120,
+                     comments=60, follows_per_user=5, batch_size=50,
+                     stdout=StringIO())
+        self.assertEqual(Post.objects.count(), 120)
+        self.assertEqual(Comment.objects.count(), 60)
+        self.assertTrue(Follow.objects.exists())
+        self.assertEqual(
+            len({post.pub_date for post in Post.objects.all()}), 120)
+        author = User.objects.order_by('-profile__posts_count').first()
+        self.assertEqual(author.profile.posts_count, author.posts.count())
+        follow = Follow.objects.first()
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=follow.user,
+                                         post__author=follow.author).count(),
+            follow.author.posts.count())
+
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'report.json')
+            call_command('bench', requests=3, warmup=1, output=output,
+                         stdout=StringIO())
+            out = StringIO()
+            call_command('bench', requests=3, warmup=0, output=output,
+                         baseline=output, stdout=out)
+            with open(output, encoding='utf-8') as report_file:
+                report = json.load(report_file)
+        self.assertEqual(report['meta']['rows']['Post'], 120)
+        for name in ('index', 'group_list', 'profile', 'post_detail',
+                     'follow_index', 'search', 'api_index'):
+            with self.subTest(view=name):
+                view = report['views'][name]
+                self.assertEqual(view['status'], 200)
+                self.assertLessEqual(view['p50_ms'], view['p95_ms'])
+                self.assertGreater(view['peak_memory_kb'], 0)
+        self.assertIn('p50_ms', out.getvalue())
+
+    def test_bench_templates(self):
+        out = StringIO()
+        call_command('bench_templates', iterations=2, warmup=0, stdout=out)
+        for variant in ('legacy', 'cached_loader', 'memoized_urls',
+                        'rendering_helpers', 'post_cards', 'card_cache'):
+            with self.subTest(variant=variant):
+                self.assertIn(f'{variant}: p50', out.getvalue())
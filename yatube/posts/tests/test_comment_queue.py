@@ -0,0 +1,106 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import OperationalError
+from django.test import (Client, TestCase, TransactionTestCase,
+                         override_settings)
+from django.urls import reverse
+
+from .. import search
+from ..comment_queue import comment_queue, insert, write
+from ..models import Comment, Post, User
+
+
+def make_comment(post, author, text):
+    comment = Comment(post=post, author=author, text=text)
+    comment._pending_token = text
+    return comment
+
+
+@override_settings(COMMENT_QUEUE_ENABLED=True)
+class CommentBatchTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='HasNoName')
+        cls.posts = [
+            Post.objects.create(author=cls.user, text=f'Пост {i}')
+            for i in range(2)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def test_batch_updates_counters_and_index(self):
+        comments = [make_comment(self.posts[0], self.user, 'Первый котик'),
+                    make_comment(self.posts[0], self.user, 'Второй'),
+                    make_comment(self.posts[1], self.user, 'Третий')]
+        write(comments)
+        for comment in comments:
+            with self.subTest(text=comment.text):
+                self.assertEqual(
+                    Comment.objects.get(pk=comment.pk).text, comment.text)
+        counts = dict(Post.objects.values_list('pk', 'comments_count'))
+        self.assertEqual(counts, {self.posts[0].pk: 2, self.posts[1].pk: 1})
+        self.assertEqual(search.search('котик'), [self.posts[0].pk])
+
+
+@override_settings(COMMENT_QUEUE_ENABLED=True, COMMENT_QUEUE_MAX_DELAY=0.05)
+class CommentQueueTest(TransactionTestCase):
+    # Очередь пишет из своего потока, а SQLite проверяет внешние ключи
+    # при коммите, поэтому тестам нужны настоящие коммиты.
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='HasNoName')
+        self.post = Post.objects.create(author=self.user, text='Текст')
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.detail_url = reverse('posts:post_detail', args=[self.post.pk])
+
+    def test_comment_written_in_background(self):
+        self.client.post(
+            reverse('posts:add_comment', args=[self.post.pk]),
+            {'text': 'Из очереди'})
+        # До записи автор видит комментарий, другие — нет.
+        response = self.client.get(self.detail_url)
+        self.assertContains(response, 'Из очереди')
+        self.assertNotContains(Client().get(self.detail_url), 'Из очереди')
+        self.assertTrue(comment_queue.join(timeout=5))
+        self.assertEqual(
+            Comment.objects.get(post=self.post).text, 'Из очереди')
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+        # После записи комментарий показывается один раз.
+        response = self.client.get(self.detail_url)
+        self.assertEqual(len(response.context['comments']), 1)
+
+    def test_broken_comment_does_not_drop_batch(self):
+        missing_post = Post(pk=0)
+        comments = [make_comment(self.post, self.user, 'Записан'),
+                    make_comment(missing_post, self.user, 'Потерян')]
+        with self.assertLogs('posts.comment_queue', 'ERROR'):
+            write(comments)
+        self.assertEqual(
+            list(Comment.objects.values_list('text', flat=True)),
+            ['Записан'])
+
+    @override_settings(COMMENT_QUEUE_RETRY_DELAY=0.01)
+    def test_locked_batch_retried(self):
+        """Пачка, не записанная из-за занятой базы, повторяется."""
+        attempts = []
+
+        def locked_once(comments):
+            attempts.append(len(comments))
+            if len(attempts) == 1:
+                raise OperationalError('database is locked')
+            insert(comments)
+
+        with mock.patch('posts.comment_queue.insert', locked_once):
+            with self.assertLogs('posts.comment_queue', 'WARNING'):
+                self.client.post(
+                    reverse('posts:add_comment', args=[self.post.pk]),
+                    {'text': 'Повторён'})
+                self.assertTrue(comment_queue.join(timeout=5))
+        self.assertEqual(attempts, [1, 1])
+        self.assertEqual(
+            Comment.objects.get(post=self.post).text, 'Повторён')
@@ -0,0 +1,46 @@
+from django.test import TestCase
+
+from ..models import Comment, Follow, Post, User
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='HasNoName')
+        cls.author = User.objects.create(username='NoNameAuthor')
+
+    def refresh_profile(self, user):
+        user.profile.refresh_from_db()
+        return user.profile
+
+    def test_posts_count(self):
+        post = Post.objects.create(author=self.author, text='Тестовый текст')
+        self.assertEqual(self.refresh_profile(self.author).posts_count, 1)
+        post.delete()
+        self.assertEqual(self.refresh_profile(self.author).posts_count, 0)
+
+    def test_comments_count(self):
+        post = Post.objects.create(author=self.author, text='Тестовый текст')
+        comment = Comment.objects.create(
+            post=post, author=self.user, text='Комментарий')
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        comment.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+
+    def test_followers_count(self):
+        follow = Follow.objects.create(user=self.user, author=self.author)
+        self.assertEqual(
+            self.refresh_profile(self.author).followers_count, 1)
+        follow.delete()
+        self.assertEqual(
+            self.refresh_profile(self.author).followers_count, 0)
+
+    def test_counter_never_negative(self):
+        post = Post.objects.create(author=self.author, text='Тестовый текст')
+        self.author.profile.posts_count = 0
+        self.author.profile.save()
+        post.delete()
+        self.assertEqual(self.refresh_profile(self.author).posts_count, 0)
@@ -0,0 +1,69 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from .. import feed_counts
+from ..models import Follow, Group, Post, User
+
+
+class FeedCountsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='HasNoName')
+        cls.author = User.objects.create(username='NoNameAuthor')
+        cls.groups = [
+            Group.objects.create(title=f'Группа {i}', slug=f'group-{i}')
+            for i in range(2)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def create_post(self, group=None):
+        return Post.objects.create(
+            author=self.author, text='Тестовый текст', group=group)
+
+    def test_counts_follow_posts(self):
+        """Числа лент сдвигаются при создании, переносе и удалении
+        поста без запросов к базе при чтении."""
+        self.create_post()
+        scopes = [('index',), ('profile', self.author.pk),
+                  ('group', self.groups[0].pk), ('group', self.groups[1].pk)]
+        for scope in scopes:
+            feed_counts.get(scope)
+        post = self.create_post(self.groups[0])
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                [feed_counts.get(scope) for scope in scopes], [2, 2, 1, 0])
+        post.group = self.groups[1]
+        post.save()
+        post = Post.objects.get(pk=post.pk)
+        post.delete()
+        self.assertEqual(
+            [feed_counts.get(scope) for scope in scopes], [1, 1, 0, 0])
+
+    def test_follow_count(self):
+        scope = ('follow', self.user.pk)
+        self.create_post()
+        self.assertEqual(feed_counts.get(scope), 0)
+        Follow.objects.create(user=self.user, author=self.author)
+        self.assertEqual(feed_counts.get(scope), 1)
+
+    def test_reconciled_when_due(self):
+        self.create_post()
+        scope = ('index',)
+        feed_counts.store(scope, 100)
+        self.assertEqual(feed_counts.get(scope), 1)
+        feed_counts.store(scope, 100)
+        self.assertEqual(feed_counts.get(scope), 100)
+        cache.delete(feed_counts.checked_key(scope))
+        self.assertEqual(feed_counts.get(scope), 1)
+
+    def test_reconcile_all(self):
+        self.create_post(self.groups[0])
+        for scope in (('index',), ('group', self.groups[0].pk),
+                      ('profile', self.author.pk)):
+            with self.subTest(scope=scope):
+                feed_counts.store(scope, 100)
+                cache.add(feed_counts.checked_key(scope), True)
+                feed_counts.reconcile_all(batch_size=1)
+                self.assertEqual(feed_counts.get(scope), 1)
@@ -1,7 +1,15 @@
-from django.test import Client, TestCase
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 
 from ..models import Group, Post, User
+from ..paginators import (KeysetPaginator, elided_page_range,
+                          encode_cursor)
 
 
 class PaginatorViewsTest(TestCase):
@@ -45,3 +53,111 @@ class PaginatorViewsTest(TestCase):
                 response = self.authorized_client.get(reverse_name + '?page=2')
                 self.assertEqual(
                     len(response.context.get('page_obj').object_list), 5)
+
+    def test_cursor_pages(self):
+        """Страницы по курсору идут следом за номерными без пропусков."""
+        first_page = self.authorized_client.get(
+            reverse('posts:index')).context['page_obj']
+        cursor = encode_cursor(first_page[-1])
+        response = self.authorized_client.get(
+            reverse('posts:index') + f'?after={cursor}')
+        page_obj = response.context['page_obj']
+        self.assertEqual(len(page_obj), 5)
+        self.assertFalse(page_obj.has_next())
+        self.assertTrue(page_obj.has_previous())
+        all_ids = [post.pk for post in first_page] + [
+            post.pk for post in page_obj]
+        self.assertEqual(
+            all_ids,
+            list(Post.objects.order_by('-pub_date', '-pk').values_list(
+                'pk', flat=True)))
+
+        cursor = encode_cursor(page_obj[0])
+        response = self.authorized_client.get(
+            reverse('posts:index') + f'?before={cursor}')
+        self.assertEqual(
+            [post.pk for post in response.context['page_obj']],
+            [post.pk for post in first_page])
+
+    def test_cursor_page_without_count(self):
+        """Страница по курсору не выполняет COUNT(*)."""
+        post = Post.objects.order_by('-pub_date', '-pk')[9]
+        paginator = KeysetPaginator(Post.objects.all())
+        with self.assertNumQueries(1):
+            page_obj = paginator.get_cursor_page(after=encode_cursor(post))
+        self.assertEqual(len(page_obj), 5)
+
+    def test_broken_cursor_falls_back_to_first_page(self):
+        response = self.authorized_client.get(
+            reverse('posts:index') + '?after=broken')
+        self.assertEqual(response.context['page_obj'].number, 1)
+
+    def test_cursor_past_end_falls_back_to_first_page(self):
+        """Курсор, за которым не осталось постов, открывает первую
+        страницу, а не пустую страницу с курсорными ссылками."""
+        oldest = Post.objects.order_by('pub_date', 'pk').first()
+        oldest.pub_date = oldest.pub_date.replace(year=2000)
+        for direction in ('after', 'before'):
+            with self.subTest(direction=direction):
+                post = oldest if direction == 'after' else Post(
+                    pk=0, pub_date=timezone.now() + timedelta(days=1))
+                response = self.authorized_client.get(
+                    reverse('posts:index')
+                    + f'?{direction}={encode_cursor(post)}')
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.context['page_obj'].number, 1)
+
+    def test_last_page_read_from_end(self):
+        """«Последняя» открывает самые старые посты без OFFSET."""
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(response, '?last=1')
+        with CaptureQueriesContext(connection) as context:
+            response = self.authorized_client.get(
+                reverse('posts:index') + '?last=1')
+        page_obj = response.context['page_obj']
+        self.assertEqual(
+            [post.pk for post in page_obj],
+            list(Post.objects.order_by('-pub_date', '-pk').values_list(
+                'pk', flat=True)[5:]))
+        self.assertTrue(page_obj.has_previous())
+        self.assertFalse(page_obj.has_next())
+        self.assertFalse(any('OFFSET' in query['sql']
+                             for query in context.captured_queries))
+
+    def test_count_estimate_read_from_cache(self):
+        """Номерная страница берёт число постов из кэша без COUNT(*)."""
+        cache.clear()
+        url = reverse('posts:index') + '?page=2'
+        self.authorized_client.get(url)
+        with CaptureQueriesContext(connection) as context:
+            response = self.authorized_client.get(url)
+        self.assertEqual(response.context['page_obj'].paginator.count, 15)
+        self.assertFalse(any('COUNT(' in query['sql']
+                             for query in context.captured_queries))
+
+    def test_stale_estimate_recounted(self):
+        for estimate in (5, 100):
+            with self.subTest(estimate=estimate):
+                cache.set('feed_count:index', estimate)
+                page_obj = self.authorized_client.get(
+                    reverse('posts:index') + '?page=2').context['page_obj']
+                self.assertEqual(page_obj.number, 2)
+                self.assertEqual(len(page_obj), 5)
+                self.assertFalse(page_obj.has_next())
+                self.assertEqual(cache.get('feed_count:index'), 15)
+
+
+class ElidedPageRangeTest(SimpleTestCase):
+
+    def test_window_around_current_page(self):
+        cases = {
+            (1, 3): [1, 2, 3],
+            (1, 500): [1, 2, 3, None, 500],
+            (4, 500): [1, 2, 3, 4, 5, 6, None, 500],
+            (250, 500): [1, None, 248, 249, 250, 251, 252, None, 500],
+            (500, 500): [1, None, 498, 499, 500],
+        }
+        for (number, num_pages), expected in cases.items():
+            with self.subTest(number=number, num_pages=num_pages):
+                self.assertEqual(
+                    list(elided_page_range(number, num_pages)), expected)
@@ -0,0 +1,55 @@
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Follow, Group, Post, User
+
+# Запросы на страницу ленты не должны зависеть от числа постов на ней.
+FEED_QUERY_BUDGET = {
+    'posts:index': 2,
+    'posts:group_list': 3,
+    'posts:profile': 4,
+    'posts:follow_index': 3,
+}
+
+
+class FeedQueriesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='HasNoName')
+        cls.authors = [
+            User.objects.create(
+                username=f'author_{i}', first_name='Имя', last_name='Фамилия')
+            for i in range(3)
+        ]
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_group',
+        )
+        for i in range(15):
+            Post.objects.create(
+                author=cls.authors[i % 3],
+                text='Тестовый текст',
+                group=cls.group,
+            )
+        for author in cls.authors:
+            Follow.objects.create(user=cls.user, author=author)
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_feed_query_budget(self):
+        """Страница ленты укладывается в фиксированное число запросов."""
+        kwargs = {
+            'posts:group_list': {'slug': self.group.slug},
+            'posts:profile': {'username': self.authors[0].username},
+        }
+        for name, budget in FEED_QUERY_BUDGET.items():
+            url = reverse(name, kwargs=kwargs.get(name))
+            # Сессия и пользователь запроса - ещё два запроса.
+            with self.subTest(name=name), self.assertNumQueries(budget + 2):
+                response = self.authorized_client.get(url)
+                self.assertEqual(response.status_code, 200)
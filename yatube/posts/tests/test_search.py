@@ -0,0 +1,161 @@
+import html
+import re
+from importlib import import_module
+from io import StringIO
+from types import SimpleNamespace
+
+from django.apps import apps
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .. import search
+from ..models import Comment, Post, User
+from ..paginators import POSTS_PER_PAGE
+
+
+class TokenizeTest(TestCase):
+    def test_russian_words_stemmed(self):
+        """Формы русского слова сводятся к одной основе."""
+        self.assertEqual(
+            len(set(search.tokenize('кот коты котов котом'))), 1)
+        self.assertEqual(search.tokenize('Ёлки-палки'),
+                         search.tokenize('елки палки'))
+
+    def test_other_words_lowercased(self):
+        self.assertEqual(search.tokenize('Django и Python 3'),
+                         ['django', 'python'])
+
+
+@override_settings(SEARCH_BACKEND='fts5')
+class FTS5SearchTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='HasNoName')
+
+    def create_post(self, text):
+        return Post.objects.create(author=self.user, text=text)
+
+    def test_fts5_available(self):
+        self.assertTrue(search.fts5_available())
+
+    def test_ranked_results(self):
+        """Совпадение в тексте поста важнее совпадения в комментарии,
+        найти можно и по другой форме слова."""
+        other = self.create_post('Про собак')
+        commented = self.create_post('Просто пост')
+        Comment.objects.create(
+            post=commented, author=self.user, text='Милые котики')
+        titled = self.create_post('Котики спят')
+        self.assertEqual(search.search('котиков'), [titled.pk, commented.pk])
+        self.assertEqual(search.search('собака'), [other.pk])
+
+    def test_all_words_required(self):
+        post = self.create_post('Рыжий кот')
+        self.create_post('Рыжая лиса')
+        self.assertEqual(search.search('рыжий кот'), [post.pk])
+
+    def test_words_across_comments(self):
+        """Слова запроса могут быть в разных записях поста: в тексте
+        и в комментарии."""
+        post = self.create_post('Рыжий кот')
+        Comment.objects.create(
+            post=post, author=self.user, text='Большая собака')
+        self.create_post('Чёрная собака')
+        self.assertEqual(search.search('кот собака'), [post.pk])
+
+    def test_index_follows_changes(self):
+        """Индекс обновляется при редактировании и удалении."""
+        post = self.create_post('Старый текст')
+        comment = Comment.objects.create(
+            post=post, author=self.user, text='Комментарий про сыр')
+        post.text = 'Новый текст'
+        post.save()
+        self.assertEqual(search.search('старый'), [])
+        self.assertEqual(search.search('новый'), [post.pk])
+        comment.delete()
+        self.assertEqual(search.search('сыр'), [])
+        post.delete()
+        self.assertEqual(search.search('новый'), [])
+
+    def test_rebuild(self):
+        post = self.create_post('Пост про море')
+        search.get_backend().clear()
+        self.assertEqual(search.search('море'), [])
+        call_command('search_index', batch_size=1, stdout=StringIO())
+        self.assertEqual(search.search('море'), [post.pk])
+
+    def test_migration_fills_index(self):
+        """Миграция индексирует посты, написанные до неё."""
+        post = self.create_post('Пост про море')
+        Comment.objects.create(post=post, author=self.user, text='Чайки')
+        search.get_backend().clear()
+        migration = import_module('posts.migrations.0008_search')
+        schema_editor = SimpleNamespace(connection=connection)
+        migration.fill_search_index(apps, schema_editor)
+        self.assertEqual(search.search('море чайка'), [post.pk])
+
+    def test_search_page(self):
+        """Страница поиска выводит найденные посты постранично и
+        сохраняет запрос в ссылках паджинатора."""
+        posts = [self.create_post(f'Море номер {i}')
+                 for i in range(POSTS_PER_PAGE + 1)]
+        self.create_post('Горы')
+        response = self.client.get(reverse('posts:search'), {'q': 'моря'})
+        page_obj = response.context['page_obj']
+        self.assertEqual(page_obj.paginator.count, len(posts))
+        self.assertEqual(len(page_obj.object_list), POSTS_PER_PAGE)
+        self.assertContains(response, '?q=%D0%BC%D0%BE%D1%80%D1%8F&amp;page=2')
+        response = self.client.get(
+            reverse('posts:search'), {'q': 'моря', 'page': 2})
+        self.assertEqual(len(response.context['page_obj'].object_list), 1)
+
+    def test_next_page_link(self):
+        """Ссылка «Следующая» ведёт на вторую страницу результатов."""
+        for i in range(POSTS_PER_PAGE + 1):
+            self.create_post(f'Море номер {i}')
+        response = self.client.get(reverse('posts:search'), {'q': 'моря'})
+        link = re.search(r'href="([^"]+)">\s*Следующая',
+                         response.content.decode())
+        response = self.client.get(
+            reverse('posts:search') + html.unescape(link.group(1)))
+        page_obj = response.context['page_obj']
+        self.assertEqual(page_obj.number, 2)
+        self.assertEqual(len(page_obj.object_list), 1)
+
+    def test_empty_query(self):
+        response = self.client.get(reverse('posts:search'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['page_obj'].paginator.count, 0)
+
+
+@override_settings(SEARCH_BACKEND='index')
+class InvertedIndexSearchTest(FTS5SearchTest):
+    def test_fts5_available(self):
+        """Обратный индекс не зависит от FTS5."""
+        self.assertIsInstance(
+            search.get_backend(), search.InvertedIndexBackend)
+
+
+class BackendsAgreeTest(TestCase):
+    def test_same_results(self):
+        """Оба индекса находят по одному запросу одни и те же посты."""
+        user = User.objects.create(username='HasNoName')
+        posts = [
+            Post.objects.create(author=user, text='Рыжий кот'),
+            Post.objects.create(author=user, text='Кот и собака'),
+            Post.objects.create(author=user, text='Рыжая лиса'),
+        ]
+        Comment.objects.create(
+            post=posts[0], author=user, text='Большая собака')
+        results = {}
+        for backend in search.BACKENDS:
+            with self.settings(SEARCH_BACKEND=backend):
+                search.rebuild(batch_size=100)
+                results[backend] = [
+                    set(search.search(query))
+                    for query in ('кот собака', 'рыжий', 'лиса кот')]
+        self.assertEqual(results['fts5'], results['index'])
+        self.assertEqual(
+            results['fts5'], [{posts[0].pk, posts[1].pk},
+                              {posts[0].pk, posts[2].pk}, set()])
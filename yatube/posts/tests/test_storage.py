@@ -0,0 +1,98 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TransactionTestCase, override_settings
+from PIL import Image
+
+from ..counters import recount_images
+from ..models import ImageBlob, Post, User
+from ..thumbnails import generate
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def make_image(name, color='red'):
+    buffer = BytesIO()
+    Image.new('RGB', (50, 40), color=color).save(buffer, 'PNG')
+    return SimpleUploadedFile(
+        name=name, content=buffer.getvalue(), content_type='image/png')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ContentAddressedStorageTest(TransactionTestCase):
+    # Файлы удаляются в transaction.on_commit, поэтому тестам нужны
+    # настоящие коммиты.
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        self.user = User.objects.create(username='HasNoName')
+
+    def create_post(self, name, color='red'):
+        return Post.objects.create(
+            author=self.user, text='Пост', image=make_image(name, color))
+
+    def test_identical_images_share_file(self):
+        """Одинаковые картинки хранятся одним файлом со счётчиком
+        ссылок и общими миниатюрами."""
+        first = self.create_post('a.png')
+        second = self.create_post('b.png')
+        self.assertEqual(first.image.name, second.image.name)
+        blob = ImageBlob.objects.get()
+        self.assertEqual(blob.name, first.image.name)
+        self.assertEqual(blob.references, 2)
+        generate(first.pk, first.image.name)
+        generate(second.pk, second.image.name)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.thumbnail.name, second.thumbnail.name)
+
+    def test_different_images_stored_separately(self):
+        first = self.create_post('a.png')
+        second = self.create_post('a.png', color='blue')
+        self.assertNotEqual(first.image.name, second.image.name)
+        self.assertEqual(ImageBlob.objects.count(), 2)
+
+    def test_file_deleted_with_last_reference(self):
+        """Файл и миниатюры удаляются только вместе с последним
+        ссылающимся постом."""
+        first = self.create_post('a.png')
+        second = self.create_post('b.png')
+        generate(first.pk, first.image.name)
+        first.refresh_from_db()
+        image_path = first.image.path
+        thumbnail_path = first.thumbnail.path
+        first.delete()
+        self.assertTrue(os.path.exists(image_path))
+        self.assertEqual(ImageBlob.objects.get().references, 1)
+        second.delete()
+        self.assertFalse(os.path.exists(image_path))
+        self.assertFalse(os.path.exists(thumbnail_path))
+        self.assertFalse(ImageBlob.objects.exists())
+
+    def test_replaced_image_released(self):
+        """Замена картинки в посте освобождает старый файл."""
+        post = self.create_post('a.png')
+        old_path = post.image.path
+        post = Post.objects.get(pk=post.pk)
+        post.image = make_image('b.png', color='blue')
+        post.save()
+        self.assertFalse(os.path.exists(old_path))
+        self.assertEqual(
+            ImageBlob.objects.get().name, post.image.name)
+
+    def test_recount_images(self):
+        first = self.create_post('a.png')
+        self.create_post('b.png')
+        ImageBlob.objects.update(references=7)
+        self.assertEqual(recount_images(batch_size=1), 1)
+        self.assertEqual(
+            ImageBlob.objects.get(name=first.image.name).references, 2)
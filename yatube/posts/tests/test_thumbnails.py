@@ -0,0 +1,105 @@
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from ..models import Post, User
+from ..thumbnails import (
+    THUMBNAIL_SIZE, VARIANT_WIDTHS, generate, thumbnail_name, variant_size,
+)
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def make_image(name, size=(50, 40), mode='RGBA'):
+    buffer = BytesIO()
+    Image.new(mode, size, color='red').save(buffer, 'PNG')
+    return SimpleUploadedFile(
+        name=name, content=buffer.getvalue(), content_type='image/png')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_ASYNC=False)
+class ThumbnailsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='HasNoName')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_thumbnail_generated_on_upload(self):
+        """При загрузке картинки строится миниатюра с детерминированным
+        именем, и шаблон выводит её адрес."""
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Пост с картинкой', 'image': make_image('a.png')},
+        )
+        post = Post.objects.get(text='Пост с картинкой')
+        self.assertEqual(post.thumbnail.name, thumbnail_name(post.image.name))
+        with Image.open(post.thumbnail.path) as thumbnail:
+            self.assertEqual(thumbnail.size, THUMBNAIL_SIZE)
+        response = self.authorized_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.pk}))
+        self.assertContains(response, post.thumbnail.url)
+
+    def test_new_image_resets_thumbnail(self):
+        """Новая картинка при редактировании получает новую миниатюру."""
+        post = Post.objects.create(
+            author=self.user, text='Пост', image=make_image('b.png'))
+        generate(post.pk, post.image.name)
+        self.authorized_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': post.pk}),
+            data={'text': 'Пост',
+                  'image': make_image('c.png', size=(60, 40))},
+        )
+        post.refresh_from_db()
+        self.assertEqual(post.thumbnail.name, thumbnail_name(post.image.name))
+        self.assertIn('c', post.thumbnail.name)
+
+    def test_image_without_thumbnail_shown_as_is(self):
+        """Пока миниатюры нет, в ленте выводится сама картинка."""
+        post = Post.objects.create(
+            author=self.user, text='Пост', image=make_image('d.png'))
+        response = self.authorized_client.get(
+            reverse('posts:profile', kwargs={'username': self.user}))
+        self.assertContains(response, post.image.url)
+
+    def test_variants_for_srcset(self):
+        """Для картинки строятся варианты всех ширин без метаданных,
+        а лента выводит их в srcset."""
+        buffer = BytesIO()
+        exif = Image.Exif()
+        exif[0x010F] = 'Камера'
+        Image.new('RGB', (1200, 800)).save(buffer, 'JPEG', exif=exif)
+        image = SimpleUploadedFile(
+            name='e.jpg', content=buffer.getvalue(),
+            content_type='image/jpeg')
+        post = Post.objects.create(author=self.user, text='Пост', image=image)
+        generate(post.pk, post.image.name)
+        post.refresh_from_db()
+
+        self.assertEqual((post.image_width, post.image_height), (1200, 800))
+        self.assertEqual(
+            [width for width, _ in post.variants['jpeg']],
+            list(VARIANT_WIDTHS))
+        for width, name in post.variants['jpeg']:
+            with Image.open(post.image.storage.path(name)) as variant:
+                self.assertEqual(variant.size, variant_size(width))
+                self.assertNotIn('exif', variant.info)
+        response = self.authorized_client.get(
+            reverse('posts:profile', kwargs={'username': self.user}))
+        self.assertContains(response, 'srcset=')
+        for _, name in post.variants['jpeg']:
+            self.assertContains(response, post.image.storage.url(name))
@@ -0,0 +1,62 @@
+from django.test import TestCase, override_settings
+
+from ..models import Follow, Post, TimelineEntry, User
+from ..timeline import follow_feed
+
+
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='HasNoName')
+        cls.author = User.objects.create(username='NoNameAuthor')
+        cls.old_post = Post.objects.create(
+            author=cls.author,
+            text='Пост до подписки',
+        )
+
+    def test_follow_backfills_timeline(self):
+        """Подписка добавляет в ленту уже написанные посты автора."""
+        Follow.objects.create(user=self.user, author=self.author)
+        self.assertEqual(list(follow_feed(self.user)), [self.old_post])
+
+    def test_new_post_fans_out(self):
+        """Новый пост попадает в ленты подписчиков автора."""
+        Follow.objects.create(user=self.user, author=self.author)
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertTrue(
+            TimelineEntry.objects.filter(user=self.user, post=post).exists())
+
+    def test_unfollow_prunes_timeline(self):
+        """Отписка убирает посты автора из ленты."""
+        follow = Follow.objects.create(user=self.user, author=self.author)
+        follow.delete()
+        self.assertFalse(self.user.timeline.exists())
+        self.assertFalse(follow_feed(self.user).exists())
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_hot_author_read_on_demand(self):
+        """Посты популярного автора не раскладываются, а читаются."""
+        Follow.objects.create(user=self.user, author=self.author)
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertFalse(self.user.timeline.exists())
+        self.assertEqual(
+            list(follow_feed(self.user).order_by('-pub_date')),
+            [post, self.old_post])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_cooled_down_author_fanned_out(self):
+        """Посты автора, переставшего быть популярным, остаются
+        в лентах подписчиков."""
+        other = User.objects.create(username='Other')
+        Follow.objects.create(user=self.user, author=self.author)
+        follow = Follow.objects.create(user=other, author=self.author)
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        follow.delete()
+        self.assertEqual(
+            list(self.user.timeline.values_list('post', flat=True)
+                 .order_by('-pub_date')),
+            [post.pk, self.old_post.pk])
+        self.assertEqual(
+            list(follow_feed(self.user).order_by('-pub_date')),
+            [post, self.old_post])
@@ -0,0 +1,123 @@
+import hashlib
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from .. import uploadhandlers
+from ..models import Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def image_bytes(size=(50, 40)):
+    buffer = BytesIO()
+    Image.new('RGB', size, color='red').save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def padded_jpeg_bytes(size=(50, 40), padding=200 * 1024):
+    """JPEG, у которого размер записан после длинного ICC-профиля."""
+    buffer = BytesIO()
+    Image.new('RGB', size, color='red').save(
+        buffer, 'JPEG', icc_profile=bytes(padding))
+    return buffer.getvalue()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_ASYNC=False)
+class ImageUploadTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='HasNoName')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def create_post(self, content):
+        image = SimpleUploadedFile(
+            name='a.png', content=content, content_type='image/png')
+        return self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Пост с картинкой', 'image': image},
+        )
+
+    def test_image_accepted(self):
+        """Картинка в пределах лимитов сохраняется как обычно."""
+        self.create_post(image_bytes())
+        post = Post.objects.get(text='Пост с картинкой')
+        self.assertTrue(post.image.name.startswith('posts/'))
+
+    @override_settings(POST_IMAGE_MAX_BYTES=100)
+    def test_too_large_file_rejected(self):
+        """Файл больше POST_IMAGE_MAX_BYTES не принимается."""
+        response = self.create_post(image_bytes())
+        self.assertFormError(
+            response, 'form', 'image', 'Файл больше 0 МБ.')
+        self.assertFalse(Post.objects.exists())
+
+    @override_settings(POST_IMAGE_MAX_PIXELS=1000)
+    def test_too_many_pixels_rejected(self):
+        """Картинка с числом пикселей больше лимита отклоняется
+        по заголовку."""
+        response = self.create_post(image_bytes())
+        self.assertFormError(
+            response, 'form', 'image',
+            'Картинка 50×40 пикселей слишком большая.')
+        self.assertFalse(Post.objects.exists())
+
+    @override_settings(POST_IMAGE_MAX_PIXELS=1000)
+    def test_padded_header_checked(self):
+        """Размер картинки проверяется, даже если заголовок
+        не поместился в HEADER_BYTES."""
+        content = padded_jpeg_bytes()
+        self.assertGreater(len(content), uploadhandlers.HEADER_BYTES)
+        response = self.create_post(content)
+        self.assertFormError(
+            response, 'form', 'image',
+            'Картинка 50×40 пикселей слишком большая.')
+        self.assertFalse(Post.objects.exists())
+
+    def test_padded_header_accepted(self):
+        """Картинка с длинным заголовком в пределах лимитов
+        сохраняется."""
+        self.create_post(padded_jpeg_bytes())
+        self.assertTrue(Post.objects.filter(text='Пост с картинкой').exists())
+
+    def test_content_hashed_while_streaming(self):
+        """Обработчик считает SHA-256 файла при приёмке."""
+        content = image_bytes()
+        request = self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'image': SimpleUploadedFile('a.png', content)},
+        ).wsgi_request
+        upload = request.FILES['image']
+        self.assertEqual(
+            upload.content_sha256, hashlib.sha256(content).hexdigest())
+
+    def test_csrf_checked(self):
+        """Замена обработчиков не отключает проверку CSRF."""
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.user)
+        response = client.post(
+            reverse('posts:post_create'), data={'text': 'Без токена'})
+        self.assertTemplateUsed(response, 'core/403csrf.html')
+        self.assertFalse(Post.objects.exists())
+
+    def test_other_uploads_use_default_handlers(self):
+        """Лимиты картинок постов не ставятся на весь сайт."""
+        request = self.client.post(
+            '/', data={'image': SimpleUploadedFile('a.png', b'a')}
+        ).wsgi_request
+        self.assertFalse(hasattr(request.FILES['image'], 'content_sha256'))
@@ -1,3 +1,4 @@
+from django.core.cache import cache
 from django.test import Client, TestCase
 
 from ..models import Group, Post, User
@@ -25,6 +26,8 @@ class StaticURLTests(TestCase):
         )
 
     def setUp(self):
+        # Анонимные страницы лент кэшируются целиком.
+        cache.clear()
         self.guest_client = Client()
         self.authorized_client = Client()
         # self.user = User.objects.create(username='HasNoName')
@@ -5,10 +5,14 @@ from django import forms
 from django.conf import settings
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase, override_settings
+from django.db import transaction
+from django.test import (Client, TestCase, TransactionTestCase,
+                         override_settings)
 from django.urls import reverse
 
-from ..models import Group, Post, User
+from .. import cache as feed_cache
+from ..models import Comment, Group, Post, User
+from ..paginators import COMMENTS_PER_PAGE
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
@@ -114,6 +118,19 @@ class TaskPagesTest(TestCase):
         self.assertEqual(post_group_0, 'Тестовая группа')
         self.assertEqual(post_image_0, 'posts/small.gif')
 
+    def test_post_cards_links(self):
+        """Карточки ленты ссылаются на автора, группу и пост."""
+        Post.objects.create(author=self.user, text='Второй пост')
+        response = self.authorized_client.get(reverse('posts:index'))
+        for url in (
+            reverse('posts:profile', args=[self.user.username]),
+            reverse('posts:group_list', args=[self.group.slug]),
+            reverse('posts:post_detail', args=[self.post.pk]),
+        ):
+            with self.subTest(url=url):
+                self.assertContains(response, f'href="{url}"')
+        self.assertContains(response, '<hr>', count=1)
+
     def test_edit_page_show_correct_context(self):
         """Шаблон edit сформирован с правильным контекстом."""
         response = self.authorized_client.get(
@@ -177,10 +194,64 @@ class TaskPagesTest(TestCase):
         )
         cache.clear()
         response_add = self.authorized_client.get(reverse('posts:index'))
+        # update() не отправляет сигналы: версия ленты не меняется,
+        # и страница отдаётся из кэша.
+        Post.objects.filter(pk=self.cached_post.pk).update(text='Другой')
+        response_cached = self.authorized_client.get(reverse('posts:index'))
+        self.assertEqual(response_add.content, response_cached.content)
         self.cached_post.delete()
         response_del = self.authorized_client.get(reverse('posts:index'))
-        self.assertEqual(response_add.content, response_del.content)
+        self.assertNotEqual(response_add.content, response_del.content)
+        self.assertNotContains(response_del, 'Тестовый текст кэширования')
+        cache.clear()
+
+    def test_feed_caches_invalidated_on_edit(self):
+        """Правка поста сразу видна в лентах группы и автора."""
+        urls = [
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user}),
+        ]
+        for url in urls:
+            self.authorized_client.get(url)
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Отредактированный текст'
+        post.save()
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.authorized_client.get(url)
+                self.assertContains(response, 'Отредактированный текст')
+
+    def test_post_cards_cached_between_feeds(self):
+        """Карточка поста рендерится один раз на правку."""
         cache.clear()
+        self.authorized_client.get(reverse('posts:index'))
+        # update() не меняет updated: профиль берёт готовую карточку.
+        Post.objects.filter(pk=self.post.pk).update(text='Новый текст')
+        response = self.authorized_client.get(
+            reverse('posts:profile', kwargs={'username': self.user}))
+        self.assertContains(response, 'Тестовый текст')
+        Post.objects.get(pk=self.post.pk).save()
+        self.user.first_name = 'Переименованный'
+        self.user.save()
+        response = self.authorized_client.get(
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}))
+        self.assertContains(response, 'Новый текст')
+        self.assertContains(response, 'Переименованный')
+        cache.clear()
+
+    def test_group_feed_invalidated_on_group_change(self):
+        """Пост, перенесённый в другую группу, пропадает из старой."""
+        other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other_group',
+        )
+        url = reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        self.authorized_client.get(url)
+        post = Post.objects.get(pk=self.post.pk)
+        post.group = other_group
+        post.save()
+        response = self.authorized_client.get(url)
+        self.assertNotContains(response, 'Тестовый текст')
 
     def test_authorized_user_follow(self):
         """Тестирование подписки на автора"""
@@ -230,3 +301,167 @@ class TaskPagesTest(TestCase):
         self.assertEqual(
             response.context.get('page_obj').object_list.count(), 0
         )
+
+
+class AnonymousPageCacheTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='HasNoName')
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='test_group')
+        cls.post = Post.objects.create(
+            author=cls.user, text='Тестовый текст', group=cls.group)
+        cls.urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': cls.group.slug}),
+            reverse('posts:profile', kwargs={'username': cls.user}),
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def test_anonymous_pages_cached(self):
+        """Анонимная страница ленты отдаётся из кэша без рендеринга
+        и помечается для прокси как public с Vary: Cookie."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                first = self.client.get(url)
+                self.assertIsNotNone(first.context)
+                cached = self.client.get(url)
+                self.assertIsNone(cached.context)
+                self.assertEqual(cached.content, first.content)
+                self.assertIn('public', cached['Cache-Control'])
+                self.assertIn('max-age=', cached['Cache-Control'])
+                self.assertIn('Cookie', cached['Vary'])
+
+    def test_pages_purged_on_post_change(self):
+        for url in self.urls:
+            self.client.get(url)
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Отредактированный текст'
+        post.save()
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertContains(response, 'Отредактированный текст')
+
+    def test_pages_purged_on_label_change(self):
+        """Новые название группы и подпись автора сразу видны
+        в лентах."""
+        for url in self.urls:
+            self.client.get(url)
+        self.group.title = 'Переименованная группа'
+        self.group.save()
+        self.user.first_name = 'Переименованный'
+        self.user.save()
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertContains(response, 'Переименованная группа')
+                self.assertContains(response, 'Переименованный')
+
+    def test_pages_purged_on_group_delete(self):
+        """После удаления группы ленты не ссылаются на неё."""
+        for url in self.urls:
+            self.client.get(url)
+        Group.objects.get(pk=self.group.pk).delete()
+        for url in (self.urls[0], self.urls[2]):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertContains(response, 'Тестовый текст')
+                self.assertNotContains(response, 'Тестовая группа')
+
+    def test_query_is_part_of_key(self):
+        self.client.get(self.urls[0])
+        response = self.client.get(self.urls[0], {'page': 2})
+        self.assertIsNotNone(response.context)
+
+    def test_authorized_pages_not_shared(self):
+        """Страница вошедшего пользователя не кэшируется и помечается
+        как private."""
+        client = Client()
+        client.force_login(self.user)
+        self.client.get(self.urls[0])
+        response = client.get(self.urls[0])
+        self.assertIsNotNone(response.context)
+        self.assertIn('private', response['Cache-Control'])
+        self.assertIn('Cookie', response['Vary'])
+
+    def test_missing_group_not_found(self):
+        response = self.client.get(
+            reverse('posts:group_list', kwargs={'slug': 'missing'}))
+        self.assertEqual(response.status_code, 404)
+
+
+class AuthorWithoutProfileTest(TestCase):
+
+    def test_pages_without_profile(self):
+        """Страницы автора, созданного без сигналов и без профиля,
+        открываются и показывают число его постов."""
+        cache.clear()
+        User.objects.bulk_create([User(username='bulk')])
+        author = User.objects.get(username='bulk')
+        post = Post.objects.create(author=author, text='Тестовый текст')
+        urls = [
+            reverse('posts:profile', kwargs={'username': author.username}),
+            reverse('posts:post_detail', kwargs={'post_id': post.pk}),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.context['posts_count'], 1)
+                self.assertContains(response, 'Тестовый текст')
+
+
+class FeedVersionCommitTest(TransactionTestCase):
+
+    def test_version_changed_after_commit(self):
+        """Версия, которую читатели видели до коммита правки, после
+        коммита устаревает."""
+        with transaction.atomic():
+            feed_cache.bump(('index',))
+            version = feed_cache.feed_version(('index',))
+        self.assertNotEqual(feed_cache.feed_version(('index',)), version)
+
+
+class CommentThreadTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='commenter')
+        cls.post = Post.objects.create(author=cls.user, text='Тестовый текст')
+        # Одинаковое время у всех комментариев: порядок держится на id.
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=cls.user, text=f'Комментарий {i}')
+            for i in range(COMMENTS_PER_PAGE + 5))
+        Post.objects.filter(pk=cls.post.pk).update(
+            comments_count=COMMENTS_PER_PAGE + 5)
+        cls.comment_ids = list(Comment.objects.order_by('pk').values_list(
+            'pk', flat=True))
+
+    def test_comments_paginated_by_cursor(self):
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        # Пост, автор с профилем и одна порция комментариев с авторами.
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        first = response.context['comments']
+        self.assertEqual([comment.pk for comment in first],
+                         self.comment_ids[:COMMENTS_PER_PAGE])
+        self.assertContains(
+            response, f'Комментариев: {COMMENTS_PER_PAGE + 5}')
+        response = self.client.get(
+            url, {'after': response.context['next_comments']})
+        self.assertEqual(
+            [comment.pk for comment in response.context['comments']],
+            self.comment_ids[COMMENTS_PER_PAGE:])
+        self.assertIsNone(response.context['next_comments'])
+        self.assertNotContains(response, 'load-comments')
+
+    def test_load_more_endpoint(self):
+        url = reverse('posts:api_post_comments', args=[self.post.pk])
+        data = self.client.get(url).json()
+        self.assertEqual(len(data['results']), COMMENTS_PER_PAGE)
+        data = self.client.get(data['next']).json()
+        self.assertEqual([comment['id'] for comment in data['results']],
+                         self.comment_ids[COMMENTS_PER_PAGE:])
+        self.assertIsNone(data['next'])
@@ -0,0 +1,161 @@
+"""Миниатюры картинок постов.
+
+При загрузке картинки в пуле фоновых потоков строятся её варианты:
+обрезка по центру до THUMBNAIL_SIZE в нескольких ширинах и форматах
+(AVIF и WebP, если их умеет собранный Pillow, и всегда JPEG). Варианты
+кодируются заново из пикселей, поэтому в них нет EXIF и других
+метаданных исходного файла. Имена вариантов зависят только от имени
+картинки. Шаблоны выводят готовые адреса и не открывают картинку при
+показе страницы.
+"""
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from core import metrics
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from . import cache
+from .models import Post
+
+THUMBNAIL_SIZE = (960, 339)
+THUMBNAIL_DIR = 'posts/thumbs'
+VARIANT_WIDTHS = (320, 640, 960)
+
+# Форматы от самого компактного к самому совместимому:
+# формат Pillow, расширение файла и параметры кодирования.
+FORMATS = {
+    'avif': ('AVIF', 'avif', {'quality': 60}),
+    'webp': ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', 'jpg', {'quality': 85, 'optimize': True,
+                             'progressive': True}),
+}
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def available_formats():
+    Image.init()
+    return [fmt for fmt, (pil_format, _, _) in FORMATS.items()
+            if pil_format in Image.SAVE]
+
+
+def variant_size(width):
+    full_width, full_height = THUMBNAIL_SIZE
+    return width, round(full_height * width / full_width)
+
+
+def variant_name(image_name, width, fmt):
+    """Имя варианта: одинаково для одной и той же картинки."""
+    stem = os.path.splitext(os.path.basename(image_name))[0]
+    width, height = variant_size(width)
+    extension = FORMATS[fmt][1]
+    return f'{THUMBNAIL_DIR}/{stem}_{width}x{height}.{extension}'
+
+
+def thumbnail_name(image_name):
+    """Имя основной миниатюры — самого широкого JPEG."""
+    return variant_name(image_name, max(VARIANT_WIDTHS), 'jpeg')
+
+
+def render_variants(image_file, formats):
+    """Варианты картинки: {(ширина, формат): байты}."""
+    with Image.open(image_file) as image:
+        image = ImageOps.exif_transpose(image).convert('RGB')
+        # Как crop="center" upscale=True у sorl.
+        image = ImageOps.fit(image, THUMBNAIL_SIZE, Image.LANCZOS)
+    variants = {}
+    for width in VARIANT_WIDTHS:
+        resized = image.resize(variant_size(width), Image.LANCZOS)
+        for fmt in formats:
+            pil_format, _, params = FORMATS[fmt]
+            buffer = BytesIO()
+            resized.save(buffer, pil_format, **params)
+            variants[width, fmt] = buffer.getvalue()
+    return variants
+
+
+def generate(post_id, image_name):
+    """Строит варианты картинки и записывает их в пост."""
+    metrics.incr('thumbnails')
+    storage = Post._meta.get_field('image').storage
+    thumbnail_storage = Post._meta.get_field('thumbnail').storage
+    formats = available_formats()
+    names = {(width, fmt): variant_name(image_name, width, fmt)
+             for width in VARIANT_WIDTHS for fmt in formats}
+    with storage.open(image_name) as image_file:
+        with Image.open(image_file) as image:
+            image_width, image_height = image.size
+        missing = [key for key, name in names.items()
+                   if not thumbnail_storage.exists(name)]
+        if missing:
+            image_file.seek(0)
+            rendered = render_variants(image_file, formats)
+            for key in missing:
+                names[key] = thumbnail_storage.save(
+                    names[key], ContentFile(rendered[key]))
+    variants = {
+        fmt: [[width, names[width, fmt]] for width in VARIANT_WIDTHS]
+        for fmt in formats
+    }
+    updated = Post.objects.filter(pk=post_id, image=image_name).update(
+        thumbnail=names[max(VARIANT_WIDTHS), 'jpeg'],
+        image_variants=json.dumps(variants),
+        image_width=image_width,
+        image_height=image_height,
+        updated=timezone.now(),
+    )
+    if updated:
+        post = Post.objects.only('author', 'group').get(pk=post_id)
+        cache.bump(*cache.post_scopes(post))
+
+
+def delete_files(image_name):
+    """Удаляет картинку и все её варианты из хранилища."""
+    Post._meta.get_field('image').storage.delete(image_name)
+    thumbnail_storage = Post._meta.get_field('thumbnail').storage
+    for width in VARIANT_WIDTHS:
+        for fmt in FORMATS:
+            thumbnail_storage.delete(variant_name(image_name, width, fmt))
+
+
+def generate_in_background(post_id, image_name):
+    try:
+        generate(post_id, image_name)
+    except Exception:
+        logger.exception('Не удалось построить миниатюру поста %s', post_id)
+    finally:
+        close_old_connections()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails',
+            )
+        return _executor
+
+
+def schedule(post):
+    """Ставит построение миниатюры в очередь после коммита."""
+    if not post.image:
+        return
+    if not settings.THUMBNAIL_ASYNC:
+        generate(post.pk, post.image.name)
+        return
+    metrics.incr('thumbnails_queued')
+    transaction.on_commit(lambda: get_executor().submit(
+        generate_in_background, post.pk, post.image.name))
@@ -0,0 +1,148 @@
+"""Материализованная лента подписок.
+
+Новый пост раскладывается по лентам подписчиков автора (fan-out on
+write), при подписке лента дополняется постами автора, при отписке —
+очищается от них. Посты авторов, у которых больше
+TIMELINE_FANOUT_LIMIT подписчиков, не раскладываются: лента
+добирает их запросом при чтении (fan-out on read). Когда автор снова
+опускается до TIMELINE_FANOUT_LIMIT подписчиков, его посты
+раскладываются по лентам всех подписчиков.
+"""
+from django.conf import settings
+from django.db import connection
+from django.db.models import F, Q
+from users.models import Profile
+
+from .models import Follow, Post, TimelineEntry
+
+# Поля, по которым паджинатор упорядочивает ленту подписок.
+FEED_KEY = ('feed_date', 'feed_id')
+
+
+def fan_out(post):
+    """Добавляет новый пост в ленты подписчиков автора."""
+    limit = settings.TIMELINE_FANOUT_LIMIT
+    follower_ids = list(
+        Follow.objects.filter(author_id=post.author_id)
+        .values_list('user_id', flat=True)[:limit + 1]
+    )
+    if len(follower_ids) > limit:
+        return
+    TimelineEntry.objects.bulk_create(
+        [TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+         for user_id in follower_ids],
+        batch_size=settings.TIMELINE_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def backfill(user_id, author_id):
+    """Дополняет ленту пользователя постами нового автора."""
+    if is_hot_author(author_id):
+        return
+    posts = Post.objects.filter(author_id=author_id).values_list(
+        'pk', 'pub_date').iterator()
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+         for post_id, pub_date in posts),
+        batch_size=settings.TIMELINE_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def insert_entries(where, params):
+    """Раскладывает по лентам посты подписок, отобранных условием where
+    над f (подписка) и pr (профиль автора), одним запросом
+    INSERT ... SELECT. Возвращает число добавленных записей."""
+    ops = connection.ops
+    entry, post, follow, profile = (
+        ops.quote_name(model._meta.db_table)
+        for model in (TimelineEntry, Post, Follow, Profile)
+    )
+    sql = (
+        f'{ops.insert_statement(ignore_conflicts=True)} {entry} '
+        f'(user_id, post_id, pub_date) '
+        f'SELECT f.user_id, p.id, p.pub_date FROM {follow} f '
+        f'INNER JOIN {post} p ON p.author_id = f.author_id '
+        f'INNER JOIN {profile} pr ON pr.user_id = f.author_id '
+        f'WHERE {where} '
+        f'{ops.ignore_conflicts_suffix_sql(ignore_conflicts=True)}'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.rowcount
+
+
+def fill_timelines():
+    """Раскладывает по лентам посты всех подписок; нужно после
+    массовой загрузки без сигналов. Возвращает число добавленных
+    записей."""
+    return insert_entries(
+        'pr.followers_count <= %s', [settings.TIMELINE_FANOUT_LIMIT])
+
+
+def cool_down(author_id):
+    """Раскладывает по лентам подписчиков посты автора, который только
+    что перестал быть популярным.
+
+    Пока автор был популярным, его посты не раскладывались и при
+    подписке в ленты не добавлялись, а теперь ленты не добирают их при
+    чтении. Возвращает id подписчиков, чьи ленты дополнены.
+    """
+    limit = settings.TIMELINE_FANOUT_LIMIT
+    if not Profile.objects.filter(
+            user_id=author_id, followers_count=limit).exists():
+        return []
+    insert_entries('f.author_id = %s', [author_id])
+    return list(Follow.objects.filter(author_id=author_id).values_list(
+        'user_id', flat=True))
+
+
+def prune(user_id, author_id):
+    """Убирает из ленты пользователя посты автора."""
+    TimelineEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id).delete()
+
+
+def is_hot_author(author_id):
+    return Profile.objects.filter(
+        user_id=author_id,
+        followers_count__gt=settings.TIMELINE_FANOUT_LIMIT,
+    ).exists()
+
+
+def hot_author_ids(user):
+    """Авторы из подписок пользователя, чьи посты читаются при показе."""
+    return list(
+        Follow.objects.filter(
+            user=user,
+            author__profile__followers_count__gt=(
+                settings.TIMELINE_FANOUT_LIMIT),
+        ).values_list('author', flat=True)
+    )
+
+
+def materialized_feed(user):
+    """Посты из записей ленты пользователя."""
+    return Post.objects.filter(timeline_entries__user=user).annotate(
+        feed_date=F('timeline_entries__pub_date'),
+        feed_id=F('timeline_entries__post'),
+    )
+
+
+def follow_feed(user, hot_ids=None):
+    """Посты ленты подписок пользователя.
+
+    Упорядочивать ленту нужно по полям FEED_KEY: без популярных
+    авторов это поля записи ленты, и страница читается одним проходом
+    по индексу (user, pub_date, post). hot_ids — популярные авторы
+    из подписок, по умолчанию hot_author_ids(user).
+    """
+    if hot_ids is None:
+        hot_ids = hot_author_ids(user)
+    if not hot_ids:
+        return materialized_feed(user)
+    entries = TimelineEntry.objects.filter(user=user).values('post_id')
+    return Post.objects.filter(
+        Q(pk__in=entries) | Q(author_id__in=hot_ids)
+    ).annotate(feed_date=F('pub_date'), feed_id=F('pk'))
@@ -0,0 +1,126 @@
+"""Потоковая приёмка картинок постов.
+
+Файл пишется во временный файл по мере поступления, одновременно
+считается его SHA-256. Размер файла и число пикселей проверяются до
+того, как файл будет принят целиком: пиксели — по заголовку картинки,
+без декодирования изображения. Если заголовок не поместился
+в HEADER_BYTES (например, из-за длинных APP-сегментов JPEG), размер
+читается из заголовка уже записанного временного файла.
+FileSystemStorage переносит принятый временный файл на место
+переименованием, без повторного копирования.
+
+Лимиты касаются только картинок постов: обработчик ставят
+представлениям декоратором image_uploads, остальные загрузки сайта
+(например, в админке) принимаются обработчиками Django.
+"""
+import hashlib
+from functools import wraps
+from io import BytesIO
+
+from core import metrics
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+from PIL import Image
+
+# Заголовки распространённых форматов помещаются в первые килобайты.
+HEADER_BYTES = 64 * 1024
+
+
+class RejectedUpload(UploadedFile):
+    """Отклонённый файл: вместо содержимого — причина отказа."""
+
+    def __init__(self, name, error):
+        super().__init__(BytesIO(), name=name, size=0)
+        self.upload_error = error
+
+
+def image_size(source):
+    """Размер картинки по заголовку из файлового объекта source
+    или None, если данных мало или это не картинка."""
+    try:
+        with Image.open(source) as image:
+            return image.size
+    except Image.DecompressionBombError:
+        raise
+    except Exception:
+        return None
+
+
+class ImageUploadHandler(TemporaryFileUploadHandler):
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.sha256 = hashlib.sha256()
+        self.received = 0
+        self.header = b''
+        self.dimensions = None
+        self.error = None
+
+    def reject(self, error):
+        self.error = error
+        self.file.close()
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.error:
+            return None
+        self.received += len(raw_data)
+        if self.received > settings.POST_IMAGE_MAX_BYTES:
+            max_mb = settings.POST_IMAGE_MAX_BYTES / 2 ** 20
+            self.reject(f'Файл больше {max_mb:.0f} МБ.')
+            return None
+        if self.dimensions is None and len(self.header) < HEADER_BYTES:
+            self.header += raw_data
+            self.check_dimensions(BytesIO(self.header))
+            if self.error:
+                return None
+        self.sha256.update(raw_data)
+        self.file.write(raw_data)
+        return None
+
+    def check_dimensions(self, source):
+        try:
+            self.dimensions = image_size(source)
+        except Image.DecompressionBombError:
+            self.dimensions = (0, 0)
+            self.reject('Слишком большая картинка.')
+            return
+        if self.dimensions is None:
+            return
+        width, height = self.dimensions
+        if width * height > settings.POST_IMAGE_MAX_PIXELS:
+            self.reject(
+                f'Картинка {width}×{height} пикселей слишком большая.')
+        self.header = b''
+
+    def file_complete(self, file_size):
+        if not self.error and self.dimensions is None:
+            self.file.flush()
+            self.file.seek(0)
+            self.check_dimensions(self.file)
+        if self.error:
+            metrics.incr('uploads_rejected')
+            return RejectedUpload(self.file_name, self.error)
+        metrics.incr('uploads')
+        metrics.incr('upload_bytes', file_size)
+        upload = super().file_complete(file_size)
+        upload.content_sha256 = self.sha256.hexdigest()
+        return upload
+
+
+def image_uploads(view):
+    """Принимает файлы запросов представления через ImageUploadHandler.
+
+    Обработчики можно заменить только до чтения тела запроса, а его
+    читает проверка CSRF. Поэтому представление исключено из проверки
+    CsrfViewMiddleware и проверяется csrf_protect после замены.
+    """
+    protected = csrf_protect(view)
+
+    @csrf_exempt
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        request.upload_handlers = [ImageUploadHandler(request)]
+        return protected(request, *args, **kwargs)
+    return wrapper
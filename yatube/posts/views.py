@@ -1,69 +1,116 @@
 from django.contrib.auth.decorators import login_required
+from django.core.exceptions import ObjectDoesNotExist
 from django.core.paginator import Paginator
 from django.shortcuts import get_object_or_404, redirect, render
+from django.utils.http import urlencode
 
+from . import comment_queue, feed_counts, search, thumbnails, timeline
+from .cache import cache_anonymous_page, feed_cache_context
 from .forms import CommentForm, PostForm
-from .models import Comment, Follow, Group, Post, User
+from .models import Follow, Group, Post, User
+from .paginators import POSTS_PER_PAGE, comments_page, paginate
+from .uploadhandlers import image_uploads
 
-POSTS_PER_PAGE = 10
 
+def group_scopes(slug):
+    group_id = Group.objects.filter(slug=slug).values_list(
+        'pk', flat=True).first()
+    return None if group_id is None else [('group', group_id)]
 
+
+def profile_scopes(username):
+    author_id = User.objects.filter(username=username).values_list(
+        'pk', flat=True).first()
+    return None if author_id is None else [('profile', author_id)]
+
+
+def posts_count(author):
+    """Число постов автора из профиля. Пользователи, созданные без
+    сигналов (bulk_create, фикстуры), профиля не имеют — для них число
+    берётся из ленты автора."""
+    try:
+        return author.profile.posts_count
+    except ObjectDoesNotExist:
+        return feed_counts.get(('profile', author.pk))
+
+
+@cache_anonymous_page(lambda: [('index',)])
 def index(request):
-    post_list = Post.objects.all()
-    posts = Paginator(post_list, POSTS_PER_PAGE)
+    post_list = Post.objects.for_feed()
     template = 'posts/index.html'
-    page_number = request.GET.get('page')
-    page_obj = posts.get_page(page_number)
+    page_obj = paginate(request, post_list, count_scope=('index',))
     context = {'page_obj': page_obj,
+               **feed_cache_context(('index',)),
                }
     return render(request, template, context)
 
 
+@cache_anonymous_page(group_scopes)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
-    paginator = Paginator(post_list, POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = group.posts.for_feed()
+    page_obj = paginate(request, post_list, count_scope=('group', group.pk))
     template = 'posts/group_list.html'
     context = {'group': group,
                'page_obj': page_obj,
+               **feed_cache_context(('group', group.pk)),
                }
     return render(request, template, context)
 
 
+@cache_anonymous_page(profile_scopes)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    post_list = Post.objects.filter(author=author)
-    paginator = Paginator(post_list, POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    author = get_object_or_404(
+        User.objects.select_related('profile'), username=username)
+    post_list = author.posts.for_feed()
+    page_obj = paginate(
+        request, post_list, count_scope=('profile', author.pk))
     following = False
     if request.user.is_authenticated:
-        following = request.user.follower.filter(
-            author=User.objects.get(username=author)).count()
+        following = request.user.follower.filter(author=author).exists()
     context = {'author': author,
                'page_obj': page_obj,
-               'posts_count': post_list.count,
+               'posts_count': posts_count(author),
                'following': following,
+               **feed_cache_context(('profile', author.pk)),
                }
     return render(request, 'posts/profile.html', context)
 
 
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
-    post_list = Post.objects.filter(author=post.author)
-    comments_list = Comment.objects.filter(post=post)
+    post = get_object_or_404(
+        Post.objects.select_related('author__profile', 'group'), pk=post_id)
+    comments, next_comments = comments_page(
+        post.comments.for_thread(), request.GET.get('after'))
+    if next_comments is None:
+        comments += comment_queue.pending_comments(request.user, post)
     form = CommentForm()
     context = {'post': post,
-               'posts_count': post_list.count,
-               'comments': comments_list,
+               'posts_count': posts_count(post.author),
+               'comments': comments,
+               'next_comments': next_comments,
                'form': form
                }
     return render(request, 'posts/post_detail.html', context)
 
 
+def search_posts(request):
+    query = request.GET.get('q', '').strip()
+    post_ids = search.search(query) if query else []
+    page_obj = Paginator(post_ids, POSTS_PER_PAGE).get_page(
+        request.GET.get('page'))
+    posts = Post.objects.for_feed().in_bulk(page_obj.object_list)
+    page_obj.object_list = [posts[pk] for pk in page_obj.object_list
+                            if pk in posts]
+    context = {'query': query,
+               'page_obj': page_obj,
+               'page_prefix': urlencode({'q': query}) + '&',
+               }
+    return render(request, 'posts/search.html', context)
+
+
 @login_required
+@image_uploads
 def post_create(request):
     form = PostForm(request.POST or None, files=request.FILES or None)
     context = {'form': form,
@@ -71,11 +118,13 @@ def post_create(request):
     if not form.is_valid():
         return render(request, 'posts/create_post.html', context)
     form.instance.author = request.user
-    form.save()
+    post = form.save()
+    thumbnails.schedule(post)
     return redirect('posts:profile', username=request.user)
 
 
 @login_required()
+@image_uploads
 def post_edit(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     username = request.user
@@ -89,19 +138,21 @@ def post_edit(request, post_id):
                    }
         if not form.is_valid():
             return render(request, 'posts/create_post.html', context)
-        form.save()
+        post = form.save()
+        if 'image' in form.changed_data:
+            thumbnails.schedule(post)
     return redirect('posts:post_detail', post_id=post_id)
 
 
 @login_required
 def add_comment(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(Post.objects.only('pk'), pk=post_id)
     form = CommentForm(request.POST or None)
     if form.is_valid():
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        comment_queue.save(comment)
     return redirect('posts:post_detail', post_id=post_id)
 
 
@@ -110,13 +161,12 @@ def follow_index(request):
     # информация о текущем пользователе доступна в переменной request.user
     # ...
     user = request.user
-    author_pk_list = user.follower.all().values_list('author', flat=True)
-    post_list = Post.objects.filter(author__in=author_pk_list)
-    paginator = Paginator(post_list, POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = timeline.follow_feed(user).for_feed()
+    page_obj = paginate(request, post_list, key=timeline.FEED_KEY,
+                        count_scope=('follow', user.pk))
     context = {'username': user,
                'page_obj': page_obj,
+               **feed_cache_context(('index',), ('follow', user.pk)),
                }
     return render(request, 'posts/follow.html', context)
 
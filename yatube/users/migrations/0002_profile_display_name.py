@@ -0,0 +1,30 @@
+# Generated by Django 2.2.16 on 2026-10-18 19:20
+
+from django.db import migrations, models
+
+
+def fill_display_names(apps, schema_editor):
+    Profile = apps.get_model('users', 'Profile')
+    profiles = list(Profile.objects.select_related('user'))
+    for profile in profiles:
+        # Как User.get_full_name(): у модели миграции нет методов.
+        profile.display_name = (
+            f'{profile.user.first_name} {profile.user.last_name}'.strip())
+    Profile.objects.bulk_update(profiles, ['display_name'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='display_name',
+            field=models.CharField(
+                blank=True, max_length=301, verbose_name='Подпись'),
+        ),
+        migrations.RunPython(fill_display_names, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+from django.contrib.auth import get_user_model
+from django.db import models
+
+User = get_user_model()
+
+
+class Profile(models.Model):
+    """Данные пользователя, которые дорого считать при каждом запросе."""
+    user = models.OneToOneField(User,
+                                primary_key=True,
+                                on_delete=models.CASCADE,
+                                related_name='profile',
+                                )
+    posts_count = models.PositiveIntegerField('Постов', default=0)
+    followers_count = models.PositiveIntegerField('Подписчиков', default=0)
+    # Копия User.get_full_name() для карточек постов.
+    display_name = models.CharField('Подпись', max_length=301, blank=True)
+
+    def __str__(self):
+        return str(self.user)
@@ -0,0 +1,24 @@
+from core.rendering import display_name
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import Profile, User
+
+NAME_FIELDS = {'first_name', 'last_name'}
+
+
+@receiver(post_save, sender=User)
+def sync_profile(sender, instance, created, update_fields, **kwargs):
+    if created:
+        Profile.objects.get_or_create(
+            user=instance, defaults={'display_name': display_name(instance)})
+    elif update_fields is None or NAME_FIELDS & set(update_fields):
+        # Вход обновляет только last_login: подпись не меняется.
+        name = display_name(instance)
+        profile = Profile.objects.filter(user=instance).exclude(
+            display_name=name).first()
+        if profile is not None:
+            # save(), а не update(): по сигналу сбрасываются кэши лент
+            # с прежней подписью.
+            profile.display_name = name
+            profile.save(update_fields=['display_name'])
@@ -1,4 +1,8 @@
+import atexit
 import os
+import shutil
+import sys
+import tempfile
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -26,13 +30,14 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
-    'posts',
+    'posts.apps.PostsConfig',
     'core',
     'about',
     'sorl.thumbnail',
 ]
 
 MIDDLEWARE = [
+    'core.middleware.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -45,12 +50,23 @@ MIDDLEWARE = [
 ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
+# Скомпилированные шаблоны хранятся в памяти процесса. Чтобы правки
+# шаблонов подхватывались без перезапуска сервера, выключите кэш.
+TEMPLATE_CACHE = True
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+if TEMPLATE_CACHE:
+    TEMPLATE_LOADERS = [
+        ('django.template.loaders.cached.Loader', TEMPLATE_LOADERS),
+    ]
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.templates.TimedDjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
-        'APP_DIRS': True,
         'OPTIONS': {
+            'loaders': TEMPLATE_LOADERS,
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -68,10 +84,16 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+# core.db.sqlite3 — SQLite в режиме WAL с настроенными PRAGMA
+# (см. core/db/sqlite3/base.py); соединения живут CONN_MAX_AGE секунд.
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'core.db.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'CONN_MAX_AGE': 60,
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+        },
     }
 }
 
@@ -127,10 +149,101 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# L1 в памяти процесса перед общим для всех воркеров L2. Вместо
+# файлового кэша L2 может быть любым бэкендом, например Redis.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+        'BACKEND': 'core.cache.TieredCache',
+        'OPTIONS': {
+            'L2': 'shared',
+            'L1_MAX_ENTRIES': 1000,
+            'L1_TIMEOUT': 5,
+            'NAMESPACES': {
+                # Версии лент читаются из L2, чтобы новые посты были
+                # видны во всех воркерах сразу.
+                'feed_version': {'TIMEOUT': None, 'L1': False},
+                # Свои метки в метриках кэша.
+                'template.cache': {},
+                'anonymous_page': {},
+                'feed_count': {},
+                'post_card': {},
+                # Ожидающие записи комментарии видны из всех воркеров.
+                'pending_comments': {'L1': False},
+            },
+        },
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'filecache'),
+    },
+}
+
+# Поиск: 'fts5', 'index' или 'auto' (FTS5, если он есть в SQLite).
+SEARCH_BACKEND = 'auto'
+SEARCH_MAX_RESULTS = 1000
+
+# Картинки постов принимаются потоком (posts.uploadhandlers): размер
+# и число пикселей проверяются до того, как файл загружен целиком.
+POST_IMAGE_MAX_BYTES = 10 * 2 ** 20
+POST_IMAGE_MAX_PIXELS = 40_000_000
+
+# Миниатюры строятся в фоновом пуле потоков после коммита.
+THUMBNAIL_ASYNC = True
+THUMBNAIL_WORKERS = 2
+
+# Отложенная запись комментариев (posts.comment_queue): пачки до
+# COMMENT_QUEUE_BATCH_SIZE штук пишутся не позже чем через
+# COMMENT_QUEUE_MAX_DELAY секунд после первого комментария пачки.
+COMMENT_QUEUE_ENABLED = False
+COMMENT_QUEUE_MAX_DELAY = 0.2
+COMMENT_QUEUE_BATCH_SIZE = 500
+COMMENT_QUEUE_PENDING_TIMEOUT = 60
+# Повторы записи в занятую базу: пауза удваивается с каждой попыткой.
+COMMENT_QUEUE_MAX_ATTEMPTS = 5
+COMMENT_QUEUE_RETRY_DELAY = 0.5
+
+# Число постов в лентах (posts.feed_counts) сдвигается при создании
+# и удалении постов и сверяется с базой раз в столько секунд.
+FEED_COUNT_RECONCILE_INTERVAL = 60 * 10
+
+# Фрагменты лент сбрасываются сменой версии ленты, а не по времени.
+FEED_CACHE_TIMEOUT = 60 * 60 * 6
+# Метрики запросов в Server-Timing и лог core.middleware. Бюджеты —
+# сколько SQL-запросов допустимо представлению; None — без ограничений.
+INSTRUMENTATION_ENABLED = True
+QUERY_BUDGET = None
+# Метрики процессов для /metrics: файлы процессов в METRICS_DIR
+# обновляются не чаще раза в METRICS_FLUSH_INTERVAL секунд.
+METRICS_DIR = os.path.join(BASE_DIR, 'metrics')
+METRICS_FLUSH_INTERVAL = 5
+METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']
+
+QUERY_BUDGETS = {
+    'posts:index': 6,
+    'posts:group_list': 6,
+    'posts:profile': 7,
+    'posts:follow_index': 7,
+    'posts:post_detail': 8,
 }
 
+# Сколько секунд прокси может отдавать анонимную страницу ленты сам.
+ANONYMOUS_PAGE_MAX_AGE = 60
+
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
+
+# Посты авторов, у которых подписчиков больше этого числа, не
+# раскладываются по лентам подписчиков, а читаются при показе ленты.
+TIMELINE_FANOUT_LIMIT = 1000
+TIMELINE_BATCH_SIZE = 500
+
+# Тесты (manage.py test и pytest) не трогают кэш и метрики запущенного
+# сайта: их cache.clear() иначе очищал бы общий L2, а версии лент
+# переходили бы из одного прогона в другой.
+TESTING = sys.argv[1:2] == ['test'] or 'pytest' in sys.modules
+if TESTING:
+    CACHES['shared'] = {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'tests',
+    }
+    METRICS_DIR = tempfile.mkdtemp(prefix='yatube-metrics-')
+    atexit.register(shutil.rmtree, METRICS_DIR, ignore_errors=True)